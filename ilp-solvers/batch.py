@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+# Solving many puzzles in one process.
+#
+# Every puzzle is one line: either N*N characters (e.g. the usual 81 characters
+# of a 9x9, with "0" or "." for the empty cells) or N*N values separated by
+# spaces for puzzles bigger than 9x9. The solution is written in the same way.
+# Puzzles can also come as whole .in files, in the format of the solver
+# scripts (which is the only way to give the cages, sums or regions of a
+# variant).
+
+# The ILP models (sudoku.py) and PuLP take much longer to load than the logic
+# solver, so they are only imported once an ILP solver is used.
+
+from methods import solve as methods_solve, n_from_cells
+from regions import variant_regions, normalize_regions, normalize_cages, normalize_pairs, \
+    normalize_sums
+import methods
+import ast
+import math
+import re
+
+# Characters/strings that mark an empty cell
+EMPTY = ["0", ".", "_", "*", "?"]
+
+# Model (class of sudoku.py) of each variant the ILP solver can use
+VARIANTS = {"normal": "Sudoku",
+            "x": "X_Sudoku",
+            "hyper": "Hyper_Sudoku",
+            "four-pyramids": "Four_Pyramids_Sudoku",
+            "killer": "Killer_Sudoku",
+            "greater-than": "Greater_Than_Sudoku",
+            "sandwich": "Sandwich_Sudoku",
+            "regions": "Sudoku"}
+
+# Solution cache of the ILP models, set on them when they are loaded
+ilp_cache = None
+
+# Returns the model class of a variant, loading sudoku.py the first time.
+def ilp_model(variant):
+    import sudoku
+    sudoku.Sudoku.cache = ilp_cache
+    return getattr(sudoku, VARIANTS[variant])
+
+# CBC without its log (which must not end up in the middle of the results)
+def cbc_solver(threads=None):
+    import pulp
+    return pulp.PULP_CBC_CMD(msg=False, threads=threads)
+
+# Variants that need more than the grid (they only come in .in files)
+EXTRA_INPUT = ["killer", "greater-than", "sandwich", "regions"]
+
+# Variants the logic solver can solve too: the ones that only add regions
+LOGIC_VARIANTS = ["normal", "x", "hyper", "four-pyramids", "regions"]
+
+# A killer cage "[(i,j),(i,j),...],sum", a region "[(i,j),(i,j),...]" and one
+# of their cells
+CAGE = re.compile(r"\[([^\[\]]*)\]\s*,\s*(\d+)")
+REGION = re.compile(r"\[([^\[\]]*)\]")
+CELL = re.compile(r"\(\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+# Reads the cages of a Killer Sudoku, returns [([(i, j), ...], sum), ...].
+def read_cages(text):
+    """
+    text: The cages, "[(i,j),(i,j),...],sum" each (the part of a .in file
+          after the grid).
+
+    Raises ValueError if the text has anything else in it.
+    """
+
+    cages = []
+    end = 0
+    for cage in CAGE.finditer(text):
+        if text[end:cage.start()].strip():
+            raise ValueError("Invalid cage: %r" % text[end:cage.start()].strip())
+        cells = [(int(i), int(j)) for i, j in CELL.findall(cage.group(1))]
+        if not cells or CELL.sub("", cage.group(1)).replace(",", "").strip():
+            raise ValueError("Invalid cage: %r" % cage.group(0))
+        cages.append((cells, int(cage.group(2))))
+        end = cage.end()
+    if text[end:].strip():
+        raise ValueError("Invalid cage: %r" % text[end:].strip())
+    return cages
+
+# Reads the regions of a puzzle file, returns [[(i, j), ...], ...].
+def read_regions(text):
+    """
+    text: The regions, "[(i,j),(i,j),...]" each (the part of a .in file
+          after the grid).
+
+    Raises ValueError if the text has anything else in it.
+    """
+
+    regions = []
+    end = 0
+    for region in REGION.finditer(text):
+        if text[end:region.start()].strip():
+            raise ValueError("Invalid region: %r" % text[end:region.start()].strip())
+        cells = [(int(i), int(j)) for i, j in CELL.findall(region.group(1))]
+        if not cells or CELL.sub("", region.group(1)).replace(",", "").strip():
+            raise ValueError("Invalid region: %r" % region.group(0))
+        regions.append(cells)
+        end = region.end()
+    if text[end:].strip():
+        raise ValueError("Invalid region: %r" % text[end:].strip())
+    return regions
+
+# Reads a puzzle line, returns (m, n, board) or None if it isn't a puzzle.
+def read_puzzle(line, m=None, n=None):
+    values = line.split()
+    if len(values) == 1:
+        values = list(values[0])
+
+    N = int(round(len(values) ** 0.5))
+    if N * N != len(values) or N == 0:
+        return None
+
+    # Without a block shape the blocks are taken to be squares
+    if m is None or n is None:
+        m = n = int(round(N ** 0.5))
+    if m * n != N:
+        return None
+
+    board = []
+    for i in range(N):
+        row = []
+        for value in values[i*N:(i+1)*N]:
+            if value in EMPTY:
+                row.append(0)
+            elif value.isdigit() and 1 <= int(value) <= N:
+                row.append(int(value))
+            else:
+                return None
+        board.append(row)
+    return m, n, board
+
+# Reads a whole .in file, returns (m, n, board, extra) or None.
+def read_puzzle_file(text, variant="normal"):
+    """
+    extra is what the variant needs besides the grid: the cages of a
+    Killer Sudoku, the pairs of a Greater Than Sudoku (greater cell first),
+    the sums of a Sandwich Sudoku, the regions (regions.py) of a puzzle with
+    its own, None for the rest.
+    """
+
+    lines = text.split("\n")
+    try:
+        m, n = map(int, lines[0].split())
+        N = m * n
+        board = []
+        for i in range(N):
+            row = lines[i + 1].split()
+            board.append([int(k) if k.isdigit() else 0 for k in row[:N]])
+            if len(row) < N:
+                return None
+    except (ValueError, IndexError):
+        return None
+
+    extra = None
+    if variant == "killer":
+        try:
+            extra = normalize_cages(read_cages("\n".join(lines[N + 1:])), N)
+        except ValueError:
+            return None
+    elif variant == "greater-than":
+        # every pair is "[(i,j),(i,j)],gt"
+        try:
+            extra = normalize_pairs([tuple(ast.literal_eval(line.split("]")[0] + "]"))
+                                     for line in lines[N + 1:]
+                                     if line.strip().startswith("[(")], N)
+        except (ValueError, SyntaxError, TypeError):
+            return None
+    elif variant == "regions":
+        try:
+            extra = normalize_regions(read_regions("\n".join(lines[N + 1:])), N)
+        except ValueError:
+            return None
+    elif variant == "sandwich":
+        try:
+            extra = normalize_sums([line.split(": ")[1].split(", ") for line in lines[N + 1:]
+                                    if line.startswith("rows") or line.startswith("columns")], N)
+        except (ValueError, IndexError):
+            return None
+    return m, n, board, extra
+
+# Writes a solved board in the same format as the input lines.
+def solution_line(board):
+    if len(board) <= 9:
+        return "".join(str(k) for row in board for k in row)
+    return " ".join(str(k) for row in board for k in row)
+
+# Board of the candidates methods.solve() returned, or None if it isn't solved
+def methods_board(sol):
+    N = sol.geo.N
+    # solved, and every house still has all the values (broken puzzles don't)
+    if sol.to_remove != 0 or 0 in sol.cells:
+        return None
+    for house in sol.geo.all_houses:
+        if n_from_cells(sol, house) != sol.geo.all_digits:
+            return None
+    # and the smaller regions have no value twice
+    for group in sol.geo.partial_houses:
+        if methods.BITS_SET[n_from_cells(sol, group)] != len(group):
+            return None
+    return [[sol.value(i*N + j) for j in range(N)] for i in range(N)]
+
+# Regions the logic solver adds to its houses: the layout of the variant, or
+# the regions of the puzzle file. Raises ValueError for the variants it can't
+# solve.
+def logic_regions(m, n, variant, extra):
+    if variant not in LOGIC_VARIANTS:
+        raise ValueError("the methods solver doesn't solve %s puzzles" % variant)
+    if variant == "regions":
+        return extra
+    return variant_regions(variant, m, n)
+
+# Logic solver (methods.py), returns the solved board or None
+def solve_with_methods(m, n, board, solver=None, variant="normal", extra=None):
+    regions = logic_regions(m, n, variant, extra)
+    return methods_board(methods_solve(board, False, False, m, n, regions=regions))
+
+# ILP model (sudoku.py) of the variant with the givens of the board set
+def build_ilp(m, n, board, variant="normal", extra=None):
+    if variant in EXTRA_INPUT:
+        puzzle = ilp_model(variant)(m, n, extra)
+    else:
+        puzzle = ilp_model(variant)(m, n)
+    N = puzzle.size()
+    for i in range(1, N + 1):
+        for j in range(1, N + 1):
+            if board[i - 1][j - 1] != 0:
+                puzzle.set_cell_value(i, j, board[i - 1][j - 1])
+    return puzzle
+
+# ILP model (sudoku.py), returns the solved board or None
+def solve_with_ilp(m, n, board, solver=None, variant="normal", extra=None):
+    if solver is None:
+        solver = cbc_solver()
+
+    puzzle = build_ilp(m, n, board, variant, extra)
+    N = puzzle.size()
+    if not puzzle.solve(solver):
+        return None
+    return [[puzzle.get_cell_value(i, j) for j in range(1, N + 1)]
+            for i in range(1, N + 1)]
+
+# Same model solved in process as an exact cover (dlx.py), no CBC
+def solve_with_dlx(m, n, board, solver=None, variant="normal", extra=None):
+    puzzle = build_ilp(m, n, board, variant, extra)
+    N = puzzle.size()
+    if not puzzle.solve(backend="dlx"):
+        return None
+    return [[puzzle.get_cell_value(i, j) for j in range(1, N + 1)]
+            for i in range(1, N + 1)]
+
+SOLVERS = {"methods": solve_with_methods,
+           "ilp": solve_with_ilp,
+           "dlx": solve_with_dlx}
+
+# Number of solutions of a puzzle, up to limit, for each solver
+def count_with_methods(m, n, board, solver=None, variant="normal", extra=None, limit=2):
+    return methods.count_solutions(board, limit, m, n, logic_regions(m, n, variant, extra))
+
+def count_with_ilp(m, n, board, solver=None, variant="normal", extra=None, limit=2):
+    if solver is None:
+        solver = cbc_solver()
+    return build_ilp(m, n, board, variant, extra).count_solutions(limit, solver)
+
+def count_with_dlx(m, n, board, solver=None, variant="normal", extra=None, limit=2):
+    return build_ilp(m, n, board, variant, extra).count_solutions(limit, backend="dlx")
+
+COUNTERS = {"methods": count_with_methods,
+            "ilp": count_with_ilp,
+            "dlx": count_with_dlx}
+
+# What the uniqueness check of a puzzle writes for its number of solutions
+UNIQUENESS = {0: "No solution", 1: "Unique", 2: "Not unique"}
+
+# Solves one input line and returns the line to write for it.
+def solve_line(line, method="methods", m=None, n=None, solver=None, variant="normal"):
+    puzzle = read_puzzle(line, m, n)
+    if puzzle is None:
+        return "Invalid puzzle"
+    board = SOLVERS[method](*puzzle, solver=solver, variant=variant)
+    if board is None:
+        return "No solution"
+    return solution_line(board)
+
+# Checks that an input line has exactly one solution, returns the line to
+# write for it.
+def check_line(line, method="methods", m=None, n=None, solver=None, variant="normal"):
+    puzzle = read_puzzle(line, m, n)
+    if puzzle is None:
+        return "Invalid puzzle"
+    return UNIQUENESS[COUNTERS[method](*puzzle, solver=solver, variant=variant)]
+
+# Solves the text of a .in file and returns the line to write for it.
+def solve_file(text, method="methods", solver=None, variant="normal"):
+    puzzle = read_puzzle_file(text, variant)
+    if puzzle is None:
+        return "Invalid puzzle"
+    m, n, board, extra = puzzle
+    board = SOLVERS[method](m, n, board, solver=solver, variant=variant, extra=extra)
+    if board is None:
+        return "No solution"
+    return solution_line(board)
+
+# Checks that the puzzle of a .in file has exactly one solution, as check_line
+def check_file(text, method="methods", solver=None, variant="normal"):
+    puzzle = read_puzzle_file(text, variant)
+    if puzzle is None:
+        return "Invalid puzzle"
+    m, n, board, extra = puzzle
+    return UNIQUENESS[COUNTERS[method](m, n, board, solver=solver, variant=variant, extra=extra)]
+
+# Puts a solution cache (cache.SolutionCache) in front of both solvers
+def use_cache(cache):
+    global ilp_cache
+    methods.cache = cache
+    ilp_cache = cache
+
+# Puzzle lines of a stream, skipping empty lines and comments (#)
+def puzzle_lines(stream):
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+# Percentile p (0-100) of a list of values, by nearest rank, None without any
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+# Worker processes -----------------------------------
+# A worker keeps its modules and model templates between puzzles, so
+# everything it needs is set once when the process starts.
+
+# The PuLP solver of a worker for a method, None if it doesn't use one
+def worker_solver(method, threads):
+    # CBC threads of this worker, so that the pool doesn't use more cores
+    # than there are
+    return cbc_solver(threads) if method == "ilp" else None
+
+worker_settings = {}
+
+def init_worker(method, variant, m, n, threads):
+    worker_settings["method"] = method
+    worker_settings["variant"] = variant
+    worker_settings["m"] = m
+    worker_settings["n"] = n
+    worker_settings["solver"] = worker_solver(method, threads)
+    # load the model now rather than with the first puzzle
+    if method != "methods":
+        ilp_model(variant)
+
+# Solves one task: ("line", text) or ("file", text)
+def solve_task(task):
+    kind, text = task
+    s = worker_settings
+    try:
+        if kind == "line":
+            return solve_line(text, s["method"], s["m"], s["n"], s["solver"], s["variant"])
+        return solve_file(text, s["method"], s["solver"], s["variant"])
+    except (ValueError, RuntimeError) as e:
+        # e.g. a variant model that rejects its constraints
+        return "Error: %s" % e
+
+# Solves a list of tasks, one call per chunk keeps the messages down
+def solve_tasks(tasks):
+    return [solve_task(task) for task in tasks]
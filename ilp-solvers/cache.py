@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+# Solution cache for puzzles of any m×n size.
+#
+# Puzzles that only differ by a relabelling of the values, by the order of the
+# rows inside each band or of the columns inside each stack, or by a
+# transposition (square blocks only), have the same solution up to that change.
+# So the cache keeps one canonical form of each puzzle and maps the solution
+# back to the orientation of whoever asks for it.
+
+from collections import OrderedDict
+from itertools import permutations, product
+from math import factorial
+import json
+import os
+
+# Puzzles with more orderings than this to compare (e.g. almost empty ones)
+# are not put in canonical form and skip the cache
+MAX_ORDERINGS = 2000
+
+
+# Transposes a board (list of rows)
+def transpose(board):
+    return [list(column) for column in zip(*board)]
+
+# Renames the values in order of first appearance (row by row), the empty
+# cells (0) stay 0. Returns the renamed cells and the renaming.
+def relabel(cells):
+    names = {0: 0}
+    out = []
+    for k in cells:
+        if k not in names:
+            names[k] = len(names)
+        out.append(names[k])
+    return tuple(out), names
+
+# Groups of lines (rows) of board that can be swapped, band by band.
+def line_groups(board, band):
+    """
+    band: The number of lines per band.
+
+    The lines of a band are sorted by a signature that doesn't change when the
+    values are renamed or the other lines are reordered: how often each of its
+    values appears in the whole puzzle, per block. Only lines with the same
+    signature (a group) have to be tried in all their orders.
+    """
+
+    N = len(board)
+    count = {}
+    for row in board:
+        for k in row:
+            count[k] = count.get(k, 0) + 1
+    stack = N // band
+    def signature(i):
+        return tuple(tuple(sorted(count[k] for k in board[i][s:s + stack] if k != 0))
+                     for s in range(0, N, stack))
+
+    bands = []
+    for b in range(0, N, band):
+        groups = []
+        for i in sorted(range(b, b + band), key=signature):
+            if groups and signature(groups[-1][0]) == signature(i):
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+        bands.append(groups)
+    return bands
+
+# Number of line orders of the groups
+def n_orders(bands):
+    count = 1
+    for groups in bands:
+        for group in groups:
+            count *= factorial(len(group))
+    return count
+
+# Every line order of the groups, as one tuple of lines per band
+def line_orders(bands):
+    return [[sum(order, ()) for order in
+             product(*[list(permutations(group)) for group in groups])]
+            for groups in bands]
+
+# Canonical form of a puzzle: (key, transform) or None if there are too many
+# orderings to compare. The transform takes a solution to the canonical form
+# and back (see to_canonical / from_canonical).
+def canonical_form(board, m, n):
+    N = m * n
+    board = [[int(board[i][j]) for j in range(N)] for i in range(N)]
+    boards = [board]
+    if m == n:
+        boards.append(transpose(board))
+
+    best = None
+    for t in range(len(boards)):
+        grid = boards[t]
+        # rows per band (m rows) and columns per stack (n columns)
+        rows_groups = line_groups(grid, m)
+        cols_groups = line_groups(transpose(grid), n)
+        if n_orders(rows_groups) * n_orders(cols_groups) > MAX_ORDERINGS:
+            return None
+        rows_choices = line_orders(rows_groups)
+        cols_choices = line_orders(cols_groups)
+
+        for rows in product(*rows_choices):
+            rows = sum(rows, ())
+            for cols in product(*cols_choices):
+                cols = sum(cols, ())
+                key, names = relabel([grid[i][j] for i in rows for j in cols])
+                if best is None or key < best[0]:
+                    best = (key, (t, rows, cols, names))
+
+    key, (t, rows, cols, names) = best
+    # values that are not in the puzzle get the names that are left, in order
+    for k in range(1, N + 1):
+        if k not in names:
+            names[k] = len(names)
+    return key, (t, rows, cols, names)
+
+# Solution of the puzzle -> solution of its canonical form
+def to_canonical(solution, transform):
+    t, rows, cols, names = transform
+    if t == 1:
+        solution = transpose(solution)
+    return tuple(names[solution[i][j]] for i in rows for j in cols)
+
+# Solution of the canonical form -> solution of the puzzle
+def from_canonical(cells, transform):
+    t, rows, cols, names = transform
+    N = len(rows)
+    value = {name: k for k, name in names.items()}
+    solution = [[0] * N for i in range(N)]
+    for a in range(N):
+        for b in range(N):
+            solution[rows[a]][cols[b]] = value[cells[a * N + b]]
+    if t == 1:
+        solution = transpose(solution)
+    return solution
+
+
+class SolutionCache:
+    # Least recently used cache of solutions, by canonical form.
+    def __init__(self, size=10000, path=None):
+        """
+        size: The number of solutions to keep.
+        path: A file to load the cache from and to save it to (optional).
+        """
+
+        self.size = size
+        self.path = path
+        self.solutions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # the canonical form of the last puzzle looked up, for put()
+        self.last = None
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for m, n, key, cells in json.load(f):
+                    self.solutions[(m, n, tuple(key))] = tuple(cells)
+            while len(self.solutions) > self.size:
+                self.solutions.popitem(last=False)
+
+    # Canonical form of the puzzle (remembered for the get/put pair)
+    def form(self, board, m, n):
+        cells = tuple(int(board[i][j]) for i in range(m*n) for j in range(m*n))
+        if self.last is None or self.last[0] != (m, n, cells):
+            self.last = ((m, n, cells), canonical_form(board, m, n))
+        return self.last[1]
+
+    # Returns the solution of the puzzle (a list of rows) or None.
+    def get(self, board, m, n):
+        form = self.form(board, m, n)
+        if form is not None and (m, n, form[0]) in self.solutions:
+            key = (m, n, form[0])
+            self.solutions.move_to_end(key)
+            self.hits += 1
+            return from_canonical(self.solutions[key], form[1])
+        self.misses += 1
+        return None
+
+    # Remembers the solution (a list of rows) of the puzzle.
+    def put(self, board, m, n, solution):
+        form = self.form(board, m, n)
+        if form is None:
+            return
+        self.solutions[(m, n, form[0])] = to_canonical(solution, form[1])
+        self.solutions.move_to_end((m, n, form[0]))
+        if len(self.solutions) > self.size:
+            self.solutions.popitem(last=False)
+
+    # Writes the cache to its file (if it has one).
+    def save(self):
+        if self.path is None:
+            return
+        data = [[m, n, list(key), list(cells)]
+                for (m, n, key), cells in self.solutions.items()]
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(self.path + ".tmp", self.path)
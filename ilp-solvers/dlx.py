@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# Exact cover backend for the models of sudoku.py (Algorithm X).
+#
+# Every "exactly one of these is 1" row of a model (a cell, a value in a
+# row/column/block or in an extra house of a variant) is a column that has to
+# be covered exactly once, and every variable x_{i,j,k} is an option that
+# covers the rows it is in. Solving the puzzle is picking one option per cell
+# so that every column is covered once, which Algorithm X does in process,
+# without writing the model for CBC.
+#
+# The other rows of a model (the cage sums of a Killer Sudoku, the pairs of a
+# Greater Than Sudoku, the sums of a Sandwich Sudoku) are side rows: after
+# every pick, each side row that lost or got an option is checked against the
+# smallest and biggest value it can still reach. The options of its open cells
+# that would take it past those bounds are dropped too (and so on for the rows
+# of those options), and the pick is undone if a row can't hold anymore.
+#
+# The columns are kept as a dict of sets (column -> options still left) and
+# the options as lists of columns, which is the same cover/uncover scheme as
+# dancing links, but with Python sets instead of linked nodes.
+
+import pulp
+
+
+# Covers the columns of option r, returns what has to be given back to undo it
+def select(X, Y, r):
+    cols = []
+    for j in Y[r]:
+        for i in X[j]:
+            for k in Y[i]:
+                if k != j:
+                    X[k].remove(i)
+        cols.append(X.pop(j))
+    return cols
+
+# Undoes select()
+def deselect(X, Y, r, cols):
+    for j in reversed(Y[r]):
+        X[j] = cols.pop()
+        for i in X[j]:
+            for k in Y[i]:
+                if k != j:
+                    X[k].add(i)
+
+
+class ExactCover:
+    # The exact cover problem of a Sudoku model.
+    def __init__(self, model, cells):
+        """
+        model: The pulp model (with the puzzle rows of the current puzzle).
+        cells: The cell of every variable, by variable name.
+        """
+
+        self.cells = cells
+
+        # Y: option -> the columns it covers, X: column -> options
+        self.Y = {}
+        X = {}
+        side = []
+        for name, c in model.constraints.items():
+            if c.sense == pulp.LpConstraintEQ and c.constant == -1 \
+               and all(a == 1 for a in c.values()):
+                X[name] = set()
+                for x in c.keys():
+                    X[name].add(x.name)
+                    self.Y.setdefault(x.name, []).append(name)
+            else:
+                side.append(c)
+        self.X = X
+
+        # the column of every cell (a row with the options of one cell only)
+        self.cell_column = {}
+        for name in X:
+            cells_of_row = set(cells[x] for x in X[name])
+            if len(cells_of_row) == 1:
+                self.cell_column[cells_of_row.pop()] = name
+
+        # side rows: (sense, constant, [(cell, {option: coefficient})])
+        self.side = []
+        self.side_of = {}
+        for c in side:
+            groups = {}
+            for x, a in c.items():
+                groups.setdefault(cells[x.name], {})[x.name] = a
+            row = (c.sense, c.constant, list(groups.items()))
+            for x in c.keys():
+                self.side_of.setdefault(x.name, []).append(len(self.side))
+            self.side.append(row)
+
+        self.chosen = {}
+
+    # Drops the options of the open cells that side row s can't take (they
+    # go to dropped), returns False if the row can't hold anymore.
+    def narrow(self, s, dropped):
+        sense, low, groups = self.side[s]
+        high = low
+        open_cells = []
+        for cell, coefficients in groups:
+            if cell in self.chosen:
+                a = coefficients.get(self.chosen[cell], 0)
+                low += a
+                high += a
+            else:
+                options = self.X[self.cell_column[cell]]
+                values = [coefficients.get(option, 0) for option in options]
+                if not values:
+                    return False
+                low += min(values)
+                high += max(values)
+                open_cells.append((coefficients, options, min(values), max(values)))
+
+        if sense != pulp.LpConstraintGE and low > 0:
+            return False
+        if sense != pulp.LpConstraintLE and high < 0:
+            return False
+
+        for coefficients, options, least, most in open_cells:
+            for option in list(options):
+                a = coefficients.get(option, 0)
+                if (sense != pulp.LpConstraintGE and low - least + a > 0) or \
+                   (sense != pulp.LpConstraintLE and high - most + a < 0):
+                    for k in self.Y[option]:
+                        self.X[k].remove(option)
+                    dropped.append(option)
+        return True
+
+    # Narrows the side rows until none of them drops anything, returns False
+    # if one of them can't hold anymore.
+    def propagate(self, rows, dropped):
+        while rows:
+            s = rows.pop()
+            start = len(dropped)
+            if not self.narrow(s, dropped):
+                return False
+            for option in dropped[start:]:
+                rows.update(self.side_of.get(option, ()))
+        return True
+
+    # Picks option r, returns what to give to drop() or None if a column or
+    # a side row can't be covered anymore
+    def pick(self, r):
+        cols = select(self.X, self.Y, r)
+        self.chosen[self.cells[r]] = r
+        dropped = []
+        if self.side:
+            rows = set()
+            for removed in cols:
+                for option in removed:
+                    rows.update(self.side_of.get(option, ()))
+            if not self.propagate(rows, dropped):
+                self.drop(r, (cols, dropped))
+                return None
+        return cols, dropped
+
+    def drop(self, r, undo):
+        cols, dropped = undo
+        for option in reversed(dropped):
+            for k in self.Y[option]:
+                self.X[k].add(option)
+        del self.chosen[self.cells[r]]
+        deselect(self.X, self.Y, r, cols)
+
+    # Walks the covers, the column with the fewest options first
+    def search(self, solution):
+        if not self.X:
+            yield list(solution)
+            return
+        c, fewest = None, None
+        for column, options in self.X.items():
+            if fewest is None or len(options) < fewest:
+                c, fewest = column, len(options)
+                if fewest == 0:
+                    break
+        for r in list(self.X[c]):
+            undo = self.pick(r)
+            if undo is None:
+                continue
+            solution.append(r)
+            yield from self.search(solution)
+            solution.pop()
+            self.drop(r, undo)
+
+    # Walks the covers that have all the given options and none of the
+    # excluded ones (the options of each one, as they are found).
+    def solutions(self, given, excluded=()):
+        for r in excluded:
+            for j in self.Y.get(r, ()):
+                self.X[j].discard(r)
+
+        # what the side rows rule out before anything is picked
+        if not self.propagate(set(range(len(self.side))), []):
+            return
+
+        solution = []
+        for r in given:
+            if r not in self.Y or self.cells[r] in self.chosen \
+               or any(j not in self.X or r not in self.X[j] for j in self.Y[r]):
+                return
+            if self.pick(r) is None:
+                return
+            solution.append(r)
+        yield from self.search(solution)
+
+    # The options of the first cover that has all the given ones (and none
+    # of the excluded ones), or None.
+    def solve(self, given, excluded=()):
+        for found in self.solutions(given, excluded):
+            return found
+        return None
@@ -0,0 +1,1372 @@
+#!/usr/bin/env python3
+
+from array import array
+from collections import OrderedDict
+from regions import normalize_regions
+import time
+
+# Candidate grid layout
+#################################################
+# For a puzzle with m×n blocks there are N = m*n values and N*N cells.
+# Every cell is a flat index i*N + j and its candidates are stored as one
+# bitmask: bit (k-1) is set while the value k is still possible.
+
+# Returns the bitmask of the value k.
+def bit(k):
+    return 1 << (k - 1)
+
+
+class MaskTable(dict):
+    # Looks up a property of a candidate mask. Masks of up to 16 values
+    # are remembered, so 9x9 and 16x16 puzzles only compute each once.
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, mask):
+        value = self.function(mask)
+        if mask < 1 << 16:
+            self[mask] = value
+        return value
+
+
+# Sorted list of the values in a mask, one lowest bit at a time
+def mask_digits(mask):
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length())
+        mask ^= low
+    return out
+
+
+# Number of candidates and sorted list of candidates of a mask
+BITS_SET = MaskTable(lambda mask: bin(mask).count("1"))
+DIGITS = MaskTable(mask_digits)
+
+
+class Geometry:
+    # Houses and other index tables of a puzzle with m×n blocks.
+    def __init__(self, m, n, regions=()):
+        """
+        m: The number of rows per puzzle block.
+        n: The number of columns per puzzle block.
+        regions: The extra regions of a variant (regions.py), as tuples of
+                 cells (i, j) numbered from 1.
+        """
+
+        self.m = m
+        self.n = n
+        self.N = N = m * n
+        self.size = N * N
+        self.all_digits = (1 << N) - 1
+
+        # smallest array type that holds a mask, plain lists for the rest
+        self.typecode = "H" if N <= 16 else "L" if N <= 32 else "Q" if N <= 64 else None
+
+        # Some helper lists to iterate through houses
+        #################################################
+
+        # return columns' lists of cells
+        self.all_columns = [[i * N + j for j in range(N)] for i in range(N)]
+
+        # same for rows
+        self.all_rows = [[i * N + j for i in range(N)] for j in range(N)]
+
+        # same for blocks
+        # this list comprehension is unreadable, but quite cool!
+        self.all_blocks = [[((b//m) * m + k//n) * N + (b % m)*n+k % n
+                            for k in range(N)] for b in range(N)]
+
+        # the extra regions: the ones of N cells have every value once, so
+        # they are houses like the others; the smaller ones only can't have
+        # a value twice, they are left to the peers and simple elimination
+        extra = [[(i - 1) * N + j - 1 for i, j in region] for region in regions]
+        self.region_houses = [region for region in extra if len(region) == N]
+        self.partial_houses = [region for region in extra if len(region) < N]
+
+        # combine them
+        self.all_houses = self.all_columns+self.all_rows+self.all_blocks+self.region_houses
+        # every group of cells with different values, the houses first
+        self.all_groups = self.all_houses + self.partial_houses
+
+        # groups that contain each cell (and their indexes in all_groups),
+        # and every other cell each cell can see
+        self.cell_houses = [[] for cell in range(self.size)]
+        self.cell_house_ids = [[] for cell in range(self.size)]
+        for h, house in enumerate(self.all_groups):
+            for cell in house:
+                self.cell_houses[cell].append(house)
+                self.cell_house_ids[cell].append(h)
+        self.peers = [set(c for house in self.cell_houses[cell] for c in house) - {cell}
+                      for cell in range(self.size)]
+
+        # cells in "column-major" order, the order the grid used to be walked in
+        self.column_major = [i * N + j for j in range(N) for i in range(N)]
+
+        # every block/line pair that overlaps, and every region and house
+        # that share two cells or more, as (both, only block, only line),
+        # and the indexes of the two houses in all_houses
+        pairs = [(block, line) for block in self.all_blocks
+                 for line in self.all_rows + self.all_columns]
+        standard = self.all_columns + self.all_rows + self.all_blocks
+        pairs += [(region, house) for r, region in enumerate(self.region_houses)
+                  for house in standard + self.region_houses[:r]
+                  if len(set(region) & set(house)) >= 2]
+        self.intersections = []
+        self.intersection_houses = []
+        house_id = {id(house): h for h, house in enumerate(self.all_houses)}
+        for block, line in pairs:
+            both = [cell for cell in block if cell in line]
+            if len(both) == 0:
+                continue
+            self.intersections.append((both,
+                                       [cell for cell in block if cell not in both],
+                                       [cell for cell in line if cell not in both]))
+            self.intersection_houses.append((house_id[id(block)], house_id[id(line)]))
+
+
+# The tables of the shapes and regions used last (every region layout a
+# client sends is a key, so only the last few are kept)
+GEOMETRIES_SIZE = 32
+geometries = OrderedDict()
+
+# Returns the (shared) tables of a puzzle with m×n blocks and the given extra
+# regions. Raises ValueError if a region doesn't fit in the grid.
+def geometry(m, n, regions=()):
+    key = (m, n, normalize_regions(regions, m * n))
+    if key in geometries:
+        geometries.move_to_end(key)
+    else:
+        geometries[key] = Geometry(*key)
+        if len(geometries) > GEOMETRIES_SIZE:
+            geometries.popitem(last=False)
+    return geometries[key]
+
+
+class Candidates:
+    # Holds the candidates of every cell of a puzzle as bitmasks.
+
+    # What solve() did to get them (a SolveStats), None for the others
+    stats = None
+
+    def __init__(self, cells, geo):
+        """
+        cells: The candidate bitmask of every cell, in flat index order.
+        geo: The Geometry of the puzzle.
+
+        Solved cells and the candidates still to remove are counted once here
+        and then kept up to date by every change made through this class.
+
+        Every change also ticks a clock and stamps the houses of the cell with
+        it, so a technique can tell which houses changed since its last pass
+        (start_pass/dirty) and leave the others alone.
+        """
+
+        self.geo = geo
+        self.cells = array(geo.typecode, cells) if geo.typecode else list(cells)
+        self.solved = 0
+        self.to_remove = 0
+        for mask in self.cells:
+            self.solved += BITS_SET[mask] == 1
+            self.to_remove += BITS_SET[mask] - 1
+
+        self.clock = 0
+        self.house_stamp = [0] * len(geo.all_groups)
+        # technique -> clock at the start of its last pass
+        self.passes = {}
+        # houses the techniques looked at (a pass over the whole grid counts
+        # all of them)
+        self.house_scans = 0
+
+    def __getitem__(self, cell):
+        return self.cells[cell]
+
+    def __len__(self):
+        return len(self.cells)
+
+    # Replaces the candidates of a cell and returns how many were removed.
+    def set(self, cell, mask):
+        old = self.cells[cell]
+        if old == mask:
+            return 0
+        self.cells[cell] = mask
+        self.clock += 1
+        for h in self.geo.cell_house_ids[cell]:
+            self.house_stamp[h] = self.clock
+        self.solved += (BITS_SET[mask] == 1) - (BITS_SET[old] == 1)
+        self.to_remove += BITS_SET[mask] - BITS_SET[old]
+        return BITS_SET[old] - BITS_SET[mask]
+
+    # Removes the values of mask from a cell and returns how many were there.
+    def remove(self, cell, mask):
+        return self.set(cell, self.cells[cell] & ~mask)
+
+    # Returns the list of candidates of a cell.
+    def digits(self, cell):
+        return DIGITS[self.cells[cell]]
+
+    # Returns the value of a solved cell, or 0 if it is not solved yet.
+    def value(self, cell):
+        mask = self.cells[cell]
+        return DIGITS[mask][0] if BITS_SET[mask] == 1 else 0
+
+    # Starts a pass of a technique, returns the clock at the start of its
+    # last pass (-1 for the first one).
+    def start_pass(self, name):
+        since = self.passes.get(name, -1)
+        self.passes[name] = self.clock
+        return since
+
+    # True if one of the houses (indexes in all_groups) changed after the
+    # clock was at since; the technique then looks at them (a house scan).
+    # A house that didn't change gives nothing more than it did last time.
+    def dirty(self, since, *houses):
+        for h in houses:
+            if self.house_stamp[h] > since:
+                self.house_scans += 1
+                return True
+        return False
+
+    # Same for the techniques that look at the whole grid: True if anything
+    # changed after the clock was at since.
+    def grid_dirty(self, since):
+        if self.clock > since:
+            self.house_scans += len(self.house_stamp)
+            return True
+        return False
+
+    def copy(self):
+        other = Candidates.__new__(Candidates)
+        other.geo = self.geo
+        other.cells = self.cells[:]
+        other.solved = self.solved
+        other.to_remove = self.to_remove
+        other.clock = self.clock
+        other.house_stamp = self.house_stamp[:]
+        other.passes = dict(self.passes)
+        other.house_scans = self.house_scans
+        return other
+
+
+# Adding candidates instead of zeros
+def pencil_in_numbers(puzzle, m, n, regions=()):
+    geo = geometry(m, n, regions)
+    cells = []
+    for i in range(geo.N):
+        for j in range(geo.N):
+            if puzzle[i][j] != 0:
+                cells.append(bit(puzzle[i][j]))
+            else:
+                cells.append(geo.all_digits)
+    return Candidates(cells, geo)
+
+
+# Count solved cells
+def n_solved(sudoku):
+    return sudoku.solved
+
+
+# Count remaining unsolved candidates to remove
+def n_to_remove(sudoku):
+    return sudoku.to_remove
+
+# Function that takes the puzzle and returns the number of all the candidates of the empty cells
+def n_candidates(sudoku):
+    candidates = 0
+    for mask in sudoku.cells:
+        if BITS_SET[mask] > 1:
+            candidates += BITS_SET[mask]
+    return candidates
+
+### ------------------ SOLVERS ----------------------------
+# 0. Simple Elimination -----------------------------------
+# If there is one number in cell - remove it from the house
+
+def simple_elimination(sudoku):
+    count = 0
+    since = sudoku.start_pass("simple_elimination")
+    for h, group in enumerate(sudoku.geo.all_groups):
+        if not sudoku.dirty(since, h):
+            continue
+        for cell in group:
+            mask = sudoku[cell]
+            if BITS_SET[mask] == 1:
+                for cell2 in group:
+                    if cell2 != cell and sudoku[cell2] & mask:
+                        count += sudoku.remove(cell2, mask)
+    return count
+
+
+# 1. Hidden Single ----------------------------------------
+# if there is only one instance of N in house - keep only it
+
+def hidden_single(sudoku):
+    count = 0
+    since = sudoku.start_pass("hidden_single")
+    for number in range(1, sudoku.geo.N + 1):
+        b = bit(number)
+        for h, group in enumerate(sudoku.geo.all_houses):
+            if not sudoku.dirty(since, h):
+                continue
+            found = [cell for cell in group if sudoku[cell] & b]
+            if len(found) == 1 and BITS_SET[sudoku[found[0]]] > 1:
+                count += sudoku.set(found[0], b)
+    return count
+
+
+# 2. CSP ----------------------------------------
+# keeps only the candidates that are part of some way to give every cell of
+# the house a different value: it covers hidden and naked pairs, triples,
+# quads (and subsets of any size)
+#
+# The cells and values of a house make a bipartite graph. A candidate is part
+# of some assignment iff it is in some maximum matching of that graph (the
+# alldifferent filtering of Regin): take one matching, then a candidate of
+# cell i that is matched to cell j can be used if j can give its value up,
+# i.e. j gets back to i (same strongly connected component) or j gets to a
+# cell that has a value nobody is matched to.
+
+def csp_list(inp):
+    size = len(inp)
+
+    # match the cells to values, the cells with fewer candidates first
+    owner = {}
+    match = [0] * size
+    def augment(i, seen):
+        for n in DIGITS[inp[i] & ~seen[0]]:
+            b = bit(n)
+            seen[0] |= b
+            if b not in owner or augment(owner[b], seen):
+                owner[b] = i
+                match[i] = b
+                return True
+        return False
+
+    for i in sorted(range(size), key=lambda i: BITS_SET[inp[i]]):
+        if not augment(i, [0]):
+            # some cells can't all get a different value
+            return [0] * size
+
+    owned = 0
+    for b in owner:
+        owned |= b
+    union = 0
+    for mask in inp:
+        union |= mask
+    free = union & ~owned
+
+    # i -> j if i could take the value of j
+    edges = [[owner[bit(n)] for n in DIGITS[inp[i] & owned & ~match[i]]]
+             for i in range(size)]
+
+    # strongly connected components (Tarjan)
+    index, low, component = [None] * size, [0] * size, [None] * size
+    stack, on_stack, counter = [], [False] * size, [0]
+    def connect(i):
+        index[i] = low[i] = counter[0]
+        counter[0] += 1
+        stack.append(i)
+        on_stack[i] = True
+        for j in edges[i]:
+            if index[j] is None:
+                connect(j)
+                low[i] = min(low[i], low[j])
+            elif on_stack[j]:
+                low[i] = min(low[i], index[j])
+        if low[i] == index[i]:
+            while True:
+                j = stack.pop()
+                on_stack[j] = False
+                component[j] = i
+                if j == i:
+                    break
+
+    for i in range(size):
+        if index[i] is None:
+            connect(i)
+
+    # cells that can give their value up for a free one
+    escape = [inp[i] & free != 0 for i in range(size)]
+    reverse = [[] for i in range(size)]
+    for i in range(size):
+        for j in edges[i]:
+            reverse[j].append(i)
+    queue = [i for i in range(size) if escape[i]]
+    while queue:
+        j = queue.pop()
+        for i in reverse[j]:
+            if not escape[i]:
+                escape[i] = True
+                queue.append(i)
+
+    out = [0] * size
+    for i in range(size):
+        mask = match[i] | (inp[i] & free)
+        for n in DIGITS[inp[i] & owned & ~match[i]]:
+            j = owner[bit(n)]
+            if component[j] == component[i] or escape[j]:
+                mask |= bit(n)
+        out[i] = mask
+    return out
+
+
+# The answer only depends on the candidates of the house, and most houses
+# don't change between two passes of the solver
+CSP_KNOWN_SIZE = 1 << 12
+csp_known = {}
+
+def csp(s):
+    count = 0
+    if len(csp_known) > CSP_KNOWN_SIZE:
+        csp_known.clear()
+    since = s.start_pass("csp")
+    for h, group in enumerate(s.geo.all_houses):
+        if not s.dirty(since, h):
+            continue
+        house = [s[cell] for cell in group]
+        key = tuple(house)
+        if key not in csp_known:
+            csp_known[key] = csp_list(house)
+        house_csp = csp_known[key]
+        if house_csp != house:
+            for i in range(len(group)):
+                count += s.set(group[i], house_csp[i])
+    return count
+
+
+# 3. Intersection -------------------------------------
+# includes: poiting pairs, box line reduction
+
+def n_from_cells(s, cells):
+    numbers = 0
+    for cell in cells:
+        numbers |= s[cell]
+    return numbers
+
+
+# remove numbers in mask from cells cells
+def remove_n_from_cells(s, mask, cells):
+    count = 0
+    for cell in cells:
+        if s[cell] & mask:
+            count += s.remove(cell, mask)
+    return count
+
+
+def intersect(s):
+    count = 0
+    since = s.start_pass("intersect")
+    for (both, only_b, only_l), houses in zip(s.geo.intersections,
+                                              s.geo.intersection_houses):
+        if not s.dirty(since, *houses):
+            continue
+
+        # get the numbers from those region
+        n_only_b = n_from_cells(s, only_b)
+        n_both = n_from_cells(s, both)
+        n_only_l = n_from_cells(s, only_l)
+
+        # numbers of the intersection missing from the line / from the block
+        count += remove_n_from_cells(s, n_both & n_only_b & ~n_only_l, only_b)
+        count += remove_n_from_cells(s, n_both & ~n_only_b & n_only_l, only_l)
+    return count
+
+
+# 4. X-Wing ----------------------------------------
+# it actually is a subset of Nice-chains, but okay,
+# let's keep it because it is kind of famous
+
+# For each number, a row pair (h1, h2) and a column pair (v1, v2) are
+# crossed when the number is in all 4 crossing cells. If the rest of the
+# rows has it but the rest of the columns does not, it goes from the rows,
+# and the other way round.
+def x_wing(s):
+    count = 0
+    if not s.grid_dirty(s.start_pass("x_wing")):
+        return count
+    geo = s.geo
+    N = geo.N
+    for number in range(1, N + 1):
+        b = bit(number)
+
+        # positions of the number along every line, as bitmasks
+        in_row = [0] * N  # over i, for the cells (i, j) of all_rows[j]
+        in_col = [0] * N  # over j, for the cells (i, j) of all_columns[i]
+        for i in range(N):
+            for j in range(N):
+                if s[i * N + j] & b:
+                    in_row[j] |= 1 << i
+                    in_col[i] |= 1 << j
+
+        for h1 in range(0, N):
+            for h2 in range(h1 + 1, N):
+                both = [k - 1 for k in DIGITS[in_row[h1] & in_row[h2]]]
+                for x, v1 in enumerate(both):
+                    for v2 in both[x + 1:]:
+                        vmask = (1 << v1) | (1 << v2)
+                        hmask = (1 << h1) | (1 << h2)
+                        if in_row[h1] & in_row[h2] & vmask != vmask:
+                            continue  # the number left one of the crossing cells
+
+                        only_row = (in_row[h1] | in_row[h2]) & ~vmask
+                        only_col = (in_col[v1] | in_col[v2]) & ~hmask
+                        if only_row and not only_col:
+                            for h in (h1, h2):
+                                for k in DIGITS[in_row[h] & ~vmask]:
+                                    count += s.remove((k - 1) * N + h, b)
+                                    in_col[k - 1] &= ~(1 << h)
+                                in_row[h] &= vmask
+                        if only_col and not only_row:
+                            for v in (v1, v2):
+                                for k in DIGITS[in_col[v] & ~hmask]:
+                                    count += s.remove(v * N + k - 1, b)
+                                    in_row[k - 1] &= ~(1 << v)
+                                in_col[v] &= hmask
+    return count
+
+
+# 5. Coloring -------------------------------------
+def get_a_hard_link(s, n, group, add_n=False):
+    b = bit(n)
+    links = [cell for cell in group if s[cell] & b]
+    if len(links) == 2:
+        if add_n:
+            return (links[0], links[1], n)
+        return (links[0], links[1])
+    return ()
+
+
+def get_all_hard_links(s, n, add_n=False):
+    # houses are listed in cell order, so a link found twice is equal
+    hard_links = {}
+    for group in s.geo.all_houses:
+        new_link = get_a_hard_link(s, n, group, add_n)
+        if new_link:
+            hard_links[new_link] = None
+    return list(hard_links)
+
+
+def get_link_chains(links):
+    # links sharing a cell end up in the same chain,
+    # and each chain starts with its first link
+    by_cell = {}
+    for i, link in enumerate(links):
+        for cell in link[:2]:
+            by_cell.setdefault(cell, []).append(i)
+
+    groups = []
+    grouped = [False] * len(links)
+    for first in range(len(links)):
+        if grouped[first]:
+            continue
+        grouped[first] = True
+        groups.append([])
+        stack = [first]
+        while stack:
+            link = links[stack.pop()]
+            groups[-1].append(link)
+            for cell in link[:2]:
+                for i in by_cell[cell]:
+                    if not grouped[i]:
+                        grouped[i] = True
+                        stack.append(i)
+    return groups
+
+
+def ab_group(chain):
+    neighbours = {}
+    for link in chain:
+        neighbours.setdefault(link[0], []).append(link[1])
+        neighbours.setdefault(link[1], []).append(link[0])
+
+    # the opposite color spreads over every link
+    a = {chain[0][0]}
+    b = {chain[0][1]}
+    stack = [(chain[0][0], a, b), (chain[0][1], b, a)]
+    while stack:
+        cell, color, other = stack.pop()
+        for cell2 in neighbours[cell]:
+            if cell2 not in other:
+                other.add(cell2)
+                stack.append((cell2, other, color))
+    return (a, b)
+
+
+def twice_in_a_house(s, n, a):
+    result = 0  # sorry for inconsistency here, count was already taken
+    b = bit(n)
+    for house in s.geo.all_houses:
+        count = 0
+        for cell in house:
+            if cell in a and s[cell] & b:
+                count += 1
+        if count > 1:
+            result += remove_n_from_cells(s, b, a)
+    return result
+
+
+def two_colors_elsewhere(s, n, all_a, all_b):
+    count = 0
+    b = bit(n)
+    peers = s.geo.peers
+    for cell in range(s.geo.size):
+        if s[cell] & b and cell not in all_a and cell not in all_b:
+            if not peers[cell].isdisjoint(all_a) \
+               and not peers[cell].isdisjoint(all_b):
+                count += s.remove(cell, b)
+    return count
+
+
+def coloring(s):
+    count = 0
+    if not s.grid_dirty(s.start_pass("coloring")):
+        return count
+    for n in range(1, s.geo.N + 1):
+        hard_links = get_all_hard_links(s, n)
+        chains = get_link_chains(hard_links)
+        for chain in chains:
+            if len(chain) > 1:
+                a, b = ab_group(chain)
+                count += twice_in_a_house(s, n, a)
+                count += twice_in_a_house(s, n, b)
+                count += two_colors_elsewhere(s, n, a, b)
+    return count
+
+
+# 6. Y-Wing -------------------------------------
+def in_one_house(s, cells):
+    for house in s.geo.cell_houses[cells[0]]:
+        if all(cell in house for cell in cells):
+            return True
+    return False
+
+
+def y_wing(s):
+    count = 0
+    if not s.grid_dirty(s.start_pass("y_wing")):
+        return count
+    hard_links = []
+    for n in range(1, s.geo.N + 1):
+        hard_links += get_all_hard_links(s, n, add_n=True)
+    for link1 in hard_links:
+        for link2 in hard_links:
+            if link1[2] != link2[2] and \
+                   (link1[0] == link2[0] or link1[0] == link2[1] or
+                    link1[1] == link2[0] or link1[1] == link2[1]) \
+                    and BITS_SET[s[link1[0]]] == 2 and BITS_SET[s[link1[1]]] == 2 \
+                    and BITS_SET[s[link2[0]]] == 2 and BITS_SET[s[link2[1]]] == 2:
+                if in_one_house(s, link1[:2] + link2[:2]):
+                    continue
+
+                # the cells that are not shared by both links
+                horn1 = link1[1] if link1[0] in link2[:2] else link1[0]
+                horn2 = link2[1] if link2[0] in link1[:2] else link2[0]
+                for n in s.digits(horn1):
+                    if s[horn2] & bit(n) \
+                       and n != link1[2] \
+                       and n != link2[2]:
+                        count += two_colors_elsewhere(s, n, (horn1,), (horn2,))
+    return count
+
+
+# 7. Nice Chains ----------------------------------
+# a.k.a. X-cycles, nice loops
+
+def get_soft_links_from_group(s, n, group):
+    b = bit(n)
+    found = [cell for cell in group if s[cell] & b]
+    if len(found) < 3:
+        return []
+
+    links = []
+    for i in range(len(found)):
+        for j in range(i + 1, len(found)):
+            links.append((found[i], found[j]))
+    return links
+
+
+def get_all_soft_links(s, n):
+    # the same two cells can share more than one house
+    soft_links = {}
+    for group in s.geo.all_houses:
+        for link in get_soft_links_from_group(s, n, group):
+            soft_links[link] = None
+    return list(soft_links)
+
+
+def add_reverse_links(links):
+    out = {}
+    for link in links:
+        out.setdefault(link[0], []).append(link[1])
+        out.setdefault(link[1], []).append(link[0])
+    return out
+
+
+# chains - for out data
+# hard_links and soft_links map each cell to the cells it is linked to
+# returns True as soon as one chain is found if first_only is set
+def find_nice_chains(link, hard_links, soft_links, chains, first_only=False):
+    last_cell = link[-1]
+    for cell in soft_links.get(last_cell, ()):
+        if cell == link[0]:
+            chains.append(link)
+            if first_only:
+                return True
+        elif len(link) + 2 < 20:
+            for cell2 in hard_links.get(cell, ()):
+                if find_nice_chains(link + (cell, cell2),
+                                    hard_links, soft_links, chains, first_only):
+                    return True
+    return False
+
+
+def double_hard_links(hard_links):
+    dlinks = []
+    for cell1 in hard_links:
+        for cell2 in hard_links[cell1]:
+            # share 1 cell
+            for cell3 in hard_links[cell2]:
+                if cell3 != cell1:
+                    dlinks.append((cell1, cell2, cell3))
+    return dlinks
+
+
+def soft_hard_links(soft_links, hard_links):
+    shlinks = []
+    for cell1 in soft_links:
+        for cell2 in soft_links[cell1]:
+            # share 1 cell
+            for cell3 in hard_links.get(cell2, ()):
+                if cell3 != cell1:
+                    shlinks.append((cell1, cell2, cell3))
+    return shlinks
+
+
+def nice_chains(s):
+    count = 0
+    if not s.grid_dirty(s.start_pass("nice_chains")):
+        return count
+    for n in range(1, s.geo.N + 1):
+        b = bit(n)
+        chains = []
+        hard_links = get_all_hard_links(s, n)
+        hard_links2 = add_reverse_links(hard_links)
+        soft_links = get_all_soft_links(s, n)
+        soft_links2 = add_reverse_links(soft_links)
+
+        # Continuous chains
+        for link in hard_links:
+            find_nice_chains(link, hard_links2, soft_links2, chains)
+        for chain in dict.fromkeys(chains):
+            all_a = set(chain[0::2])
+            all_b = set(chain[1::2])
+            count += two_colors_elsewhere(s, n, all_a, all_b)
+
+        # Two hard in a row
+        dlinks = double_hard_links(hard_links2)
+        for dlink in dlinks:
+            if find_nice_chains(dlink, hard_links2, soft_links2, [], True):
+                count += s.set(dlink[1], s[dlink[1]] & b)
+
+        # Two soft in a row
+        shlinks = soft_hard_links(soft_links2, hard_links2)
+        for shlink in shlinks:
+            if s[shlink[0]] & b and \
+               find_nice_chains(shlink, hard_links2, soft_links2, [], True):
+                count += s.remove(shlink[0], b)
+    return count
+
+
+# 8. 3D Medusa -----------------------------------------
+# chains are made of links (cell1, cell2, n) and bicells (cell, mask);
+# the colors a and b are lists of (cell, n), in the order they were found
+
+def get_all_bicells(s):
+    bicells = []
+    for cell in s.geo.column_major:
+        if BITS_SET[s[cell]] == 2:
+            bicells.append((cell, s[cell]))
+    return bicells
+
+
+def get_medusa_chains(links_original, bicells_original):
+    links = links_original.copy()
+    bicells = bicells_original.copy()
+    groups = []
+    while len(links):
+        groups.append([links[0]])
+        del links[0]
+        for link in groups[-1]:  # the group grows while we go through it
+            if len(link) == 3:  # it's a link
+                b = bit(link[2])
+                for cell in link[0:2]:
+                    # add other links
+                    for i in range(len(links))[::-1]:
+                        if (links[i][0] == cell or links[i][1] == cell) \
+                                and link[2] == links[i][2]:
+                            groups[-1].append(links[i])
+                            del links[i]
+                    # add other bicells
+                    for i in range(len(bicells))[::-1]:
+                        if bicells[i][0] == cell and bicells[i][1] & b:
+                            groups[-1].append(bicells[i])
+                            del bicells[i]
+            else:  # it's a bicell
+                # add other links
+                for i in range(len(links))[::-1]:
+                    if (links[i][0] == link[0] or links[i][1] == link[0]) \
+                            and link[1] & bit(links[i][2]):
+                        groups[-1].append(links[i])
+                        del links[i]
+    return groups
+
+
+def ab_group_medusa(chain):
+    a = [(chain[0][0], chain[0][2]),]
+    b = [(chain[0][1], chain[0][2]),]
+    in_a, in_b = set(a), set(b)
+
+    def paint(node, color, in_color):
+        nonlocal keep_going
+        if node not in in_color:
+            color.append(node)
+            in_color.add(node)
+            keep_going = True
+
+    keep_going = True
+    while keep_going:
+        keep_going = False
+        for link in chain:
+            if len(link) == 3:  # it's a link
+                first, second = (link[0], link[2]), (link[1], link[2])
+                if first in in_a:
+                    paint(second, b, in_b)
+                if first in in_b:
+                    paint(second, a, in_a)
+                if second in in_a:
+                    paint(first, b, in_b)
+                if second in in_b:
+                    paint(first, a, in_a)
+            else: # it's a bicell
+                n1, n2 = DIGITS[link[1]]
+                first, second = (link[0], n1), (link[0], n2)
+                if first in in_a:
+                    paint(second, b, in_b)
+                if first in in_b:
+                    paint(second, a, in_a)
+                if second in in_a:
+                    paint(first, b, in_b)
+                if second in in_b:
+                    paint(first, a, in_a)
+    return  (a, b)
+
+def same_color_twice_in_cell(s, a):
+    count = 0
+    cells = {}
+    for cell, n in a:
+        cells.setdefault(cell, set()).add(n)
+    if any(len(numbers) > 1 for numbers in cells.values()):
+        for cell, n in a:
+            count += remove_n_from_cells(s, bit(n), (cell,))
+    return count
+
+def twice_in_a_house_medusa(s, a):
+    count = 0
+    # this one is not finished, cause I haven't found any examples in my set
+    return count
+
+# returns the first value each cell has in a color
+def first_in_chain(chain):
+    first = {}
+    for cell, n in chain:
+        first.setdefault(cell, n)
+    return first
+
+def two_colors_in_a_cell(s, a, b):
+    count = 0
+    found_colors = {}
+    for cell, n in a+b:
+        found_colors.setdefault(cell, []).append(n)
+    for cell, found in found_colors.items():
+        if BITS_SET[s[cell]] > 2 and len(found) > 1:
+            keep = 0
+            for n in found:
+                keep |= bit(n)
+            count += s.set(cell, s[cell] & keep)
+    return count
+
+
+def two_colors_elsewhere_medusa(s, all_a, all_b):
+    count = 0
+    first_a, first_b = first_in_chain(all_a), first_in_chain(all_b)
+    peers = s.geo.peers
+    for cell in s.geo.column_major:
+        if cell not in first_a and cell not in first_b:
+            for n in s.digits(cell):
+                if any(c in peers[cell] for c, k in all_a if k == n) \
+                   and any(c in peers[cell] for c, k in all_b if k == n):
+                    count += s.remove(cell, bit(n))
+    return count
+
+
+def two_colors_unit_cell(s, all_a, all_b):
+    count = 0
+    first_a, first_b = first_in_chain(all_a), first_in_chain(all_b)
+    peers = s.geo.peers
+    for cell in s.geo.column_major:  # go through all cells
+        for (a, b) in [(first_a, first_b), (first_b, first_a)]:  # A-cell, B-house; then the other way round
+            if BITS_SET[s[cell]] > 1 and cell in a and cell not in b: # 2+ numbers in cell, from one chain, but not from the other
+                in_cell = a[cell]  # The number that is from the chain
+                for n in s.digits(cell):  # Go through the numbers in the cell
+                    if n != in_cell:  # Except for the one from the chain
+                        # Is there an item from another chain, that the cell can see
+                        if any(b.get(c) == n for c in peers[cell]):
+                            count += s.remove(cell, bit(n))
+    return count
+
+def empty_by_color(s, all_a, all_b):
+    count = 0
+    first_a, first_b = first_in_chain(all_a), first_in_chain(all_b)
+    peers = s.geo.peers
+    for cell in s.geo.column_major:
+        for (a, first, b) in [(all_a, first_a, first_b), (all_b, first_b, first_a)]:
+            if BITS_SET[s[cell]] > 1 and cell not in first and cell not in b:
+                found = 0
+                for c in peers[cell]:
+                    if c in first:
+                        found |= bit(first[c])
+                if found & s[cell] == s[cell]:
+                    for c, n in a:
+                        count += remove_n_from_cells(s, bit(n), (c,))
+                    return count
+    return count
+
+
+def medusa_3d(s):
+    count = 0
+    if not s.grid_dirty(s.start_pass("medusa_3d")):
+        return count
+    hard_links = []
+    for n in range(1, s.geo.N + 1):
+        hard_links += get_all_hard_links(s, n, add_n=True)
+    bicells = get_all_bicells(s)
+    chains = get_medusa_chains(hard_links, bicells)
+    for chain in chains:
+        if len(chain) > 1:
+            a, b = ab_group_medusa(chain)
+            count += same_color_twice_in_cell(s, a)
+            count += same_color_twice_in_cell(s, b)
+            count += twice_in_a_house_medusa(s, a)
+            count += twice_in_a_house_medusa(s, b)
+            count += two_colors_in_a_cell(s, a, b)
+            count += two_colors_elsewhere_medusa(s, a, b)
+            count += two_colors_unit_cell(s, a, b)
+            count += empty_by_color(s, a, b)
+    return count
+
+
+# 9. Backtracking
+# a.k.a. Brute Force
+# The cell with the fewest candidates is forced first and every assignment
+# is propagated to its peers. Changes go to a trail, so a failed branch is
+# undone in place instead of working on copies of the grid.
+
+def get_next_cell_to_force(s):
+    next_cell, fewest = None, s.geo.N + 1
+    for cell in range(s.geo.size):
+        count = BITS_SET[s[cell]]
+        if 1 < count < fewest:
+            next_cell, fewest = cell, count
+            if count == 2:
+                break
+    return next_cell
+
+
+# Walks the branches of s until limit solutions are found or there are no
+# branches left. Returns (solutions found, iterations); s is left at the first
+# solution, or as it was if there is none.
+def search(s, limit, verbose):
+    iter_counter = 0
+    found = 0
+    first = None
+
+    # (cell, candidates before the change), newest last
+    trail = []
+
+    # remove the values of the solved cells in queue from their peers,
+    # returns False if a peer is left with no candidates
+    def propagate(queue):
+        while queue:
+            while queue:
+                cell = queue.pop()
+                mask = s[cell]
+                for peer in s.geo.peers[cell]:
+                    old = s[peer]
+                    if old & mask:
+                        if old == mask:
+                            return False
+                        trail.append((peer, old))
+                        s.set(peer, old & ~mask)
+                        if BITS_SET[old & ~mask] == 1:
+                            queue.append(peer)
+            if not hidden_singles(queue):
+                return False
+        return True
+
+    # a value with only one place left in a house goes there (and is queued
+    # for propagate), returns False if a value has no place at all
+    def hidden_singles(queue):
+        for group in s.geo.all_houses:
+            once, twice = 0, 0
+            for cell in group:
+                twice |= once & s[cell]
+                once |= s[cell]
+            if once != s.geo.all_digits:
+                return False
+            for n in DIGITS[once & ~twice]:
+                b = bit(n)
+                for cell in group:
+                    if s[cell] & b:
+                        break
+                else:
+                    return False
+                if s[cell] != b:
+                    trail.append((cell, s[cell]))
+                    s.set(cell, b)
+                    queue.append(cell)
+        return True
+
+    def undo(mark):
+        while len(trail) > mark:
+            cell, old = trail.pop()
+            s.set(cell, old)
+
+    # returns True once the limit is reached (and the search can stop)
+    def iteration():
+        nonlocal iter_counter, found, first
+
+        iter_counter += 1
+        if iter_counter%100000 == 0 and verbose:
+            print ("Iteration", iter_counter)
+
+        # is solved - count it, and keep the first one
+        if s.to_remove == 0:
+            found += 1
+            if first is None:
+                first = s.cells[:]
+            return found >= limit
+
+        # find next unsolved cell
+        next_cell = get_next_cell_to_force(s)
+
+        # apply all options, undoing the ones that fail
+        for n in s.digits(next_cell):
+            mark = len(trail)
+            trail.append((next_cell, s[next_cell]))
+            s.set(next_cell, bit(n))
+            if propagate([next_cell]) and iteration():
+                return True
+            undo(mark)
+        return False
+
+    solved = [cell for cell in range(s.geo.size) if BITS_SET[s[cell]] == 1]
+    stopped = 0 not in s.cells and propagate(solved) and iteration()
+    # unless it stopped at the first solution, go back and put that one in
+    if not stopped or found > 1:
+        undo(0)
+        if first is not None:
+            for cell in range(s.geo.size):
+                s.set(cell, first[cell])
+    return found, iter_counter
+
+
+def brute_force(s, verbose, stats=None):
+    t = time.time()
+    found, iter_counter = search(s, 1, verbose)
+    if stats is not None:
+        stats.backtracking_iterations = iter_counter
+        stats.backtracking_used = found > 0
+    if found:
+        if verbose:
+            print ("Backtracking took:", time.time()-t, "sec., with", iter_counter, "attempts made")
+        return s
+
+    # this is only if puzzle is broken and couldn't be forced
+    if verbose:
+        print ("The puzzle appears to be broken")
+    return s
+
+
+# Number of solutions of a puzzle, counting stops at limit (so with the
+# default 2 it tells no solution, unique or not unique apart).
+def count_solutions(original_puzzle, limit=2, m=None, n=None, regions=()):
+    if m is None or n is None:
+        m = n = int(round(len(original_puzzle) ** 0.5))
+    puzzle = pencil_in_numbers(original_puzzle, m, n, regions)
+    return search(puzzle, limit, False)[0]
+
+
+# Main Solver ---------------------------------------
+# Solution cache (cache.SolutionCache) used by solve(), if one is set
+cache = None
+
+# The logic techniques by name. Every one takes the candidates and returns how
+# many it removed.
+techniques = {
+        'Simple elimination': simple_elimination,
+        'Hidden single': hidden_single,
+        'CSP': csp,
+        'Intersection': intersect,
+        'X-Wing': x_wing,
+        'Coloring': coloring,
+        'Y-Wing': y_wing,
+        'Nice chains': nice_chains,
+        '3D Medusa': medusa_3d}
+
+# Names of the methods, in the order of the report
+legend = list(techniques) + ['Backtracking']
+
+# What solve() uses when it is not given an order (hidden singles are left to
+# the backtracking)
+default_order = [name for name in legend if name != 'Hidden single']
+
+
+class SolveStats:
+    # What a solve() call did: calls, time and removed candidates of every
+    # technique (by name), and the backtracking.
+    def __init__(self):
+        self.calls = dict.fromkeys(legend, 0)
+        self.time = dict.fromkeys(legend, 0.0)
+        self.removed = dict.fromkeys(legend, 0)
+        # houses looked at (see Candidates.dirty)
+        self.scans = dict.fromkeys(legend, 0)
+        # seconds spent in the logic techniques (before any backtracking)
+        self.logic_time = 0.0
+        # seconds spent building the candidates (pencil_in_numbers)
+        self.build_time = 0.0
+        self.backtracking_used = False
+        self.backtracking_iterations = 0
+        self.from_cache = False
+
+    def record(self, name, removed, seconds, scans=0):
+        self.calls[name] += 1
+        self.time[name] += seconds
+        self.removed[name] += removed
+        self.scans[name] += scans
+
+    # Candidates removed by the techniques after the simple elimination
+    # (the backtracking not included)
+    def advanced_removed(self):
+        return sum(self.removed[name] for name in techniques if name != 'Simple elimination')
+
+    # Candidates removed per millisecond spent in the technique
+    def removed_per_ms(self, name):
+        if self.time[name] == 0:
+            return 0.0
+        return self.removed[name] / (self.time[name] * 1000)
+
+    # Adds the numbers of another solve() (e.g. to sum up a whole corpus)
+    def add(self, other):
+        for name in legend:
+            self.calls[name] += other.calls[name]
+            self.time[name] += other.time[name]
+            self.removed[name] += other.removed[name]
+            self.scans[name] += other.scans[name]
+        self.logic_time += other.logic_time
+        self.build_time += other.build_time
+        self.backtracking_iterations += other.backtracking_iterations
+
+    # The techniques that were called, best yield per cost first: an order
+    # to give back to solve()
+    def ranking(self):
+        used = [name for name in techniques if self.calls[name] > 0]
+        return sorted(used, key=self.removed_per_ms, reverse=True)
+
+
+# m x n is the shape of a block (m rows, n columns). If it is not given the
+# puzzle is taken to be a classic one with square blocks (9x9, 16x16, ...)
+def solve(original_puzzle, verbose, all_at_once=False, m=None, n=None,
+          order=None, hooks=None, regions=()):
+    """
+    order: The names of the techniques to use, in the order to try them
+        (default_order if not given). The first one runs every round, the
+        others only if the ones before them removed nothing. Leaving out
+        'Backtracking' leaves the puzzle as far as logic got.
+    hooks: Functions called after every technique call with (name, removed,
+        seconds, puzzle).
+    regions: The extra regions of a variant (regions.py), whose values must
+        all be different too. Meant for 9x9 grids: the backtracking only
+        branches on cells, and a sparse 12x12 or 16x16 hyper puzzle can take
+        minutes.
+
+    Returns the candidates, with what was done in their stats (SolveStats).
+    """
+
+    stats = SolveStats()
+    if order is None:
+        order = default_order
+    logic = [name for name in order if name != 'Backtracking']
+
+    if m is None or n is None:
+        m = n = int(round(len(original_puzzle) ** 0.5))
+
+    # the cache only knows plain puzzles (its symmetries would move the regions)
+    use_cache = cache is not None and not regions
+    if use_cache:
+        solution = cache.get(original_puzzle, m, n)
+        if solution is not None:
+            if verbose:
+                print("- Info:")
+                print("Solution found in the cache")
+            puzzle = pencil_in_numbers(solution, m, n)
+            stats.from_cache = True
+            puzzle.stats = stats
+            return puzzle
+
+    start = time.perf_counter()
+    puzzle = pencil_in_numbers(original_puzzle, m, n, regions)
+    stats.build_time = time.perf_counter() - start
+    size = puzzle.geo.size
+    solved = puzzle.solved
+    to_remove = puzzle.to_remove
+    if verbose:
+        print("- Info:")
+        print ("Initial puzzle: complete cells", solved, "/%d. Candidates to remove:" % size, to_remove)
+
+    t = time.time()
+
+    # Control how solver goes through methods:
+    # False - go back to previous method if the next one yeld results
+    # True - try all methods one by one and then go back
+
+    while to_remove != 0 and logic:
+        r_step = 0
+
+        for i in range(len(logic)):
+            if i == 0 or all_at_once or r_step == 0:
+                start = time.perf_counter()
+                scans = puzzle.house_scans
+                r = techniques[logic[i]](puzzle)
+                seconds = time.perf_counter() - start
+                stats.record(logic[i], r, seconds, puzzle.house_scans - scans)
+                if hooks:
+                    for hook in hooks:
+                        hook(logic[i], r, seconds, puzzle)
+                r_step += r
+
+        # check state
+        solved = puzzle.solved
+        to_remove = puzzle.to_remove
+
+        # Nothing helped, logic failed
+        if r_step == 0:
+            break
+
+    stats.logic_time = time.time() - t
+    if verbose:
+        print ("Solved with logic: number of complete cells", solved, "/%d. Candidates to remove:" % size, to_remove)
+        print ("Time elapsed:", stats.logic_time, "sec.")
+
+    if to_remove > 0 and 'Backtracking' in order:
+        for_brute = puzzle.to_remove
+        start = time.perf_counter()
+        puzzle = brute_force(puzzle, verbose, stats)
+        seconds = time.perf_counter() - start
+        stats.record('Backtracking', for_brute, seconds)
+        if hooks:
+            for hook in hooks:
+                hook('Backtracking', for_brute, seconds, puzzle)
+
+    # Report:
+    if verbose:
+        print ("\n- Methods used:")
+        for i in range(len(legend)):
+            print(" {:1d}. {:<18} : {:>3d}".format(i, legend[i], stats.removed[legend[i]]))
+        print()
+
+    # Only complete solutions go to the cache (broken puzzles have empty cells)
+    if use_cache and puzzle.to_remove == 0 and 0 not in puzzle.cells:
+        N = m * n
+        cache.put(original_puzzle, m, n,
+                  [[puzzle.value(i*N + j) for j in range(N)] for i in range(N)])
+    puzzle.stats = stats
+    return puzzle
+
+
+# Difficulty rating ---------------------------------
+# The levels, and for every factor of the rating its weight, the levels of
+# its values as (level, low, high) open intervals tried in order, and the
+# level of the values in none of them (None: the factor adds nothing). The
+# bounds are those of the classic 9x9 puzzle.
+LEVELS = ["Easy", "Medium", "Hard", "Very Hard"]
+INF = float("inf")
+RATING_FACTORS = [
+    # 1. empty cells
+    (0.3, [(0, 0, 27), (1, 26, 40), (2, 39, 74)], 3),
+    # 2. candidates of the empty cells (after simple elimination)
+    (0.25, [(0, 0, 100), (1, 99, 170), (2, 169, 220)], 3),
+    # 3. candidates removed by the simple elimination
+    (0.2, [(3, -INF, 50), (2, -INF, 100), (1, -INF, 200)], 0),
+    # 4. candidates the techniques after the simple elimination removed (a
+    #    count, so the level doesn't change with the speed of the solver)
+    (0.15, [(0, -INF, 41), (1, 40, 51), (2, 50, 61), (3, 60, INF)], None),
+    # 5. backtracking attempts (only if backtracking was used)
+    (0.1, [(0, -INF, 50), (1, -INF, 200), (2, -INF, 1000)], 3)]
+
+# Level (index in LEVELS) of a value of a factor, or None
+def rating_level(value, intervals, default):
+    for level, low, high in intervals:
+        if low < value < high:
+            return level
+    return default
+
+
+# Function that finds the level of difficulty of the puzzle (stats are the
+# SolveStats of its solution)
+def evaluate_puzzle(puzzle, stats, m=None, n=None):
+    if m is None or n is None:
+        m = n = int(round(len(puzzle) ** 0.5))
+
+    empty_cells = sum(row.count(0) for row in puzzle)
+    remaining_candidates = sum(sum(row) for row in count_remaining_candidates(puzzle, m, n))
+    erased_candidates = sum(sum(row) for row in count_candidates(puzzle)) - remaining_candidates
+    backtracking = stats.backtracking_iterations if stats.backtracking_used else None
+    values = [empty_cells, remaining_candidates, erased_candidates, stats.advanced_removed(),
+              backtracking]
+
+    # Every factor adds its weight to the level of its value
+    levels = [0.0] * len(LEVELS)
+    for value, (weight, intervals, default) in zip(values, RATING_FACTORS):
+        if value is None:
+            continue
+        level = rating_level(value, intervals, default)
+        if level is not None:
+            levels[level] += weight
+
+    # The level with the most weight (the easier one if two have the same)
+    return LEVELS[levels.index(max(levels))]
+
+
+# Function that counts the number of candidates in the empty cells (the
+# values none of their peers is given)
+def count_remaining_candidates(puzzle, m=None, n=None):
+    if m is None or n is None:
+        m = n = int(round(len(puzzle) ** 0.5))
+    geo = geometry(m, n)
+    N = geo.N
+    given = [bit(k) if k else 0 for row in puzzle for k in row]
+
+    candidates_count = [[0] * N for i in range(N)]
+    for cell in range(geo.size):
+        if given[cell] == 0:
+            seen = 0
+            for peer in geo.peers[cell]:
+                seen |= given[peer]
+            candidates_count[cell // N][cell % N] = BITS_SET[geo.all_digits & ~seen]
+    return candidates_count
+
+# Same for all the values: every empty cell has N candidates
+def count_candidates(puzzle):
+    N = len(puzzle)
+    return [[N if k == 0 else 0 for k in row] for row in puzzle]
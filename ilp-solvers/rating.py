@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Difficulty rating of many puzzles at once.
+#
+# The puzzles are one (P, N, N) integer array (0 for the empty cells), and the
+# counts the rating needs (empty cells, candidates left by the simple
+# elimination) are worked out for all of them together with NumPy. As in
+# methods.py every cell is a bitmask of values: the givens of every row, column
+# and block are OR-ed along the axes, and the candidates of an empty cell are
+# the bits none of its three houses has. The factors and their bounds are
+# those of methods.evaluate_puzzle.
+#
+# The puzzles are taken in chunks, so the arrays in between stay small for
+# millions of puzzles.
+
+from functools import reduce
+from methods import LEVELS, RATING_FACTORS
+import numpy as np
+
+# Puzzles per chunk
+CHUNK = 1 << 16
+
+
+# Reads puzzle lines of N*N characters ("0" or "." for the empty cells) into
+# a (P, N, N) array, e.g. the usual lines of 81 characters of a 9x9.
+def boards_from_lines(lines, N=9):
+    data = np.frombuffer("".join(line.strip() for line in lines).encode(), dtype=np.uint8)
+    boards = data.reshape(-1, N, N).astype(np.int8) - ord("0")
+    boards[boards < 0] = 0
+    return boards
+
+# Number of empty cells and of candidates of the empty cells (the values no
+# given of their row, column and block has), for each puzzle.
+def candidate_counts(boards, m=3, n=3):
+    """
+    boards: The (P, N, N) array of the puzzles, N = m*n.
+
+    Returns two arrays of P counts: the empty cells and the candidates.
+    """
+
+    boards = np.asarray(boards)
+    P, N = boards.shape[0], m * n
+    dtype = np.uint16 if N <= 16 else np.uint32 if N <= 32 else np.uint64
+    all_digits = dtype((1 << N) - 1)
+    empty = np.count_nonzero(boards == 0, axis=(1, 2))
+    remaining = np.zeros(P, dtype=np.int64)
+
+    for start in range(0, P, CHUNK):
+        chunk = boards[start:start + CHUNK]
+        # bit k-1 of a given k, 0 for the empty cells
+        given = np.where(chunk > 0, dtype(1) << (chunk.astype(dtype) - dtype(1)), dtype(0))
+
+        # (OR-ing N slices is faster than reducing along a short axis)
+        in_row = reduce(np.bitwise_or, [given[:, :, j] for j in range(N)])       # p, i
+        in_column = reduce(np.bitwise_or, [given[:, i, :] for i in range(N)])    # p, j
+        # blocks of m rows and n columns: p, block row, block column
+        blocks = given.reshape(-1, n, m, m, n)
+        in_block = reduce(np.bitwise_or, [blocks[:, :, i, :, j]
+                                          for i in range(m) for j in range(n)])
+        in_block = in_block.repeat(m, axis=1).repeat(n, axis=2)
+
+        seen = in_row[:, :, None] | in_column[:, None, :] | in_block
+        free = np.where(chunk == 0, all_digits & ~seen, dtype(0))
+        remaining[start:start + CHUNK] = popcount(free).sum(axis=(1, 2))
+    return empty, remaining
+
+# Number of bits set of every mask of an array
+def popcount(masks):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks)
+    # NumPy before 2.0: one bit at a time
+    count = np.zeros(masks.shape, dtype=np.int64)
+    for k in range(masks.dtype.itemsize * 8):
+        count += (masks >> k) & 1
+    return count
+
+# Level (index in LEVELS) of every value of a factor, -1 for none
+def rating_levels(values, intervals, default):
+    levels = np.full(len(values), -1 if default is None else default)
+    # the first interval that has the value wins, so they go in backwards
+    for level, low, high in reversed(intervals):
+        levels[(values > low) & (values < high)] = level
+    return levels
+
+# Rates P puzzles, returns an array with the level of each ("Easy", ...).
+def rate_puzzles(boards, m=3, n=3, advanced_removed=None, backtracking=None):
+    """
+    boards: The (P, N, N) array of the puzzles, N = m*n.
+    advanced_removed: The candidates the techniques after the simple
+                      elimination removed from each puzzle, if they were
+                      solved (SolveStats.advanced_removed()).
+    backtracking: The backtracking attempts of each puzzle, 0 for the ones
+                  that didn't need backtracking.
+
+    Without the removed candidates and attempts those two factors are left
+    out, so the rating only depends on the givens.
+    """
+
+    empty, remaining = candidate_counts(boards, m, n)
+    erased = empty * (m * n) - remaining
+    values = [empty, remaining, erased, advanced_removed, backtracking]
+    P = len(empty)
+
+    # every factor adds its weight to the level of its value, in the same
+    # order as evaluate_puzzle (so the sums and the ties are the same)
+    scores = np.zeros((P, len(LEVELS)))
+    for i, (weight, intervals, default) in enumerate(RATING_FACTORS):
+        if values[i] is None:
+            continue
+        levels = rating_levels(np.asarray(values[i], dtype=float), intervals, default)
+        if i == 4:
+            # only the puzzles that used backtracking
+            levels[np.asarray(backtracking) <= 0] = -1
+        for level in range(len(LEVELS)):
+            scores[:, level] += np.where(levels == level, weight, 0.0)
+
+    # argmax takes the first of the best, the easier level on a tie
+    return np.array(LEVELS)[scores.argmax(axis=1)]
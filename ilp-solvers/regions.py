@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+# Extra regions of the Sudoku variants.
+#
+# A variant that only adds houses to the grid (X, Hyper, Four Pyramids, ...)
+# is a list of regions: lists of cells (i, j), numbered from 1 as in sudoku.py,
+# whose values must all be different. A region of N cells has every value
+# once, like a row; a smaller one only can't have a value twice. The regions
+# of a puzzle are the layout of its variant, worked out here for any block
+# shape, and/or the ones given in its puzzle file.
+#
+# sudoku.py adds one row per value and region to its model template, and
+# methods.py adds the regions to the houses and peers of its Geometry. Both
+# keep what they built by (m, n, regions), so the regions are kept as tuples
+# and the same layout is always the same key.
+#
+# The other clues of the variants (killer cages, greater than pairs and
+# sandwich sums) are checked here as well, before they reach a model.
+
+
+# The two diagonals
+def x_regions(m, n):
+    N = m * n
+    return [[(i, i) for i in range(1, N + 1)],
+            [(i, N + 1 - i) for i in range(1, N + 1)]]
+
+# Windows of the block shape, one line in from the top and left border and
+# one line apart (the four windows of the 9x9, the nine of the 16x16)
+def hyper_regions(m, n):
+    N = m * n
+    rows = range(2, N - m + 2, m + 1)
+    columns = range(2, N - n + 2, n + 1)
+    return [[(i, j) for i in range(top, top + m) for j in range(left, left + n)]
+            for top in rows for left in columns]
+
+# A pyramid of N cells on each border, all four the same turned by 90
+# degrees; N has to be a square (h*h cells in h steps of 2h-1, 2h-3, ... 1)
+def four_pyramids_regions(m, n):
+    N = m * n
+    h = int(round(N ** 0.5))
+    if h * h != N:
+        raise ValueError("a four pyramids puzzle needs a square number of values, not %d" % N)
+    start = max(1, (N - 2 * h + 1) // 2)
+    pyramid = [(i, j + 1) for j in range(h) for i in range(start + j, start + 2 * h - 1 - j)]
+    pyramids = [pyramid]
+    for turn in range(3):
+        pyramids.append([(j, N + 1 - i) for i, j in pyramids[-1]])
+    return pyramids
+
+# Layout of each variant that adds regions
+LAYOUTS = {"x": x_regions,
+           "hyper": hyper_regions,
+           "four-pyramids": four_pyramids_regions}
+
+# Checks the regions of an N×N puzzle and returns them as a tuple of tuples
+# of cells, in the order given. Raises ValueError for a cell outside the grid,
+# a cell that is twice in a region or a region of more than N cells.
+def normalize_regions(regions, N):
+    normal = []
+    for region in regions:
+        cells = tuple((int(i), int(j)) for i, j in region)
+        if any(not (1 <= i <= N and 1 <= j <= N) for i, j in cells):
+            raise ValueError("Region outside the %dx%d grid: %r" % (N, N, list(cells)))
+        if len(set(cells)) != len(cells) or len(cells) > N:
+            raise ValueError("Region with repeated or too many cells: %r" % list(cells))
+        normal.append(cells)
+    return tuple(normal)
+
+# Checks the cages of an N×N Killer Sudoku (regions with the sum of their
+# values) and returns them as a tuple of (cells, sum), the cells as in
+# normalize_regions. Raises ValueError for an empty cage, a cell outside the
+# grid, a cell that is twice in the cages, a cage of more than N cells or a
+# sum its cells can't make with different values of 1..N.
+def normalize_cages(cages, N):
+    normal = []
+    caged = set()
+    for cells, total in cages:
+        cells = tuple((int(i), int(j)) for i, j in cells)
+        if not cells or len(cells) > N:
+            raise ValueError("Cage with no or too many cells: %r" % list(cells))
+        if any(not (1 <= i <= N and 1 <= j <= N) for i, j in cells):
+            raise ValueError("Cage outside the %dx%d grid: %r" % (N, N, list(cells)))
+        if len(set(cells)) != len(cells) or caged.intersection(cells):
+            raise ValueError("Cage with repeated cells: %r" % list(cells))
+        caged.update(cells)
+
+        # the sums of the smallest and of the biggest values
+        size, total = len(cells), int(total)
+        low, high = size * (size + 1) // 2, size * (2 * N - size + 1) // 2
+        if not low <= total <= high:
+            raise ValueError("Cage sum %d not in %d..%d: %r" % (total, low, high, list(cells)))
+        normal.append((cells, total))
+    return tuple(normal)
+
+# Checks the pairs of an N×N Greater Than Sudoku and returns them as a tuple
+# of ((i1, j1), (i2, j2)), the greater cell first. Raises ValueError for a
+# pair that isn't two different cells of the grid.
+def normalize_pairs(pairs, N):
+    normal = []
+    for pair in pairs:
+        try:
+            (i1, j1), (i2, j2) = pair
+            cells = ((int(i1), int(j1)), (int(i2), int(j2)))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid pair: %r" % (pair,))
+        if any(not (1 <= i <= N and 1 <= j <= N) for i, j in cells):
+            raise ValueError("Pair outside the %dx%d grid: %r" % (N, N, cells))
+        if cells[0] == cells[1]:
+            raise ValueError("Pair of a cell with itself: %r" % (cells,))
+        normal.append(cells)
+    return tuple(normal)
+
+# Checks the sums of an N×N Sandwich Sudoku, [row sums, column sums], and
+# returns them as a tuple of two tuples of N numbers. Raises ValueError if
+# there aren't N of each or a sum is more than the values between the 1 and
+# the N (2..N-1) add up to.
+def normalize_sums(sums, N):
+    if len(sums) != 2:
+        raise ValueError("Sandwich sums need one line of rows and one of columns")
+    most = sum(range(2, N))
+    normal = []
+    for name, line in zip(("rows", "columns"), sums):
+        try:
+            line = tuple(int(total) for total in line)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid %s sums: %r" % (name, line))
+        if len(line) != N:
+            raise ValueError("%d %s sums, not %d" % (len(line), name, N))
+        if any(not 0 <= total <= most for total in line):
+            raise ValueError("%s sums not in 0..%d: %r" % (name.capitalize(), most, line))
+        normal.append(line)
+    return tuple(normal)
+
+# Regions of a variant's layout for m×n blocks, () for the variants without
+# one.
+def variant_regions(variant, m, n):
+    if variant not in LAYOUTS:
+        return ()
+    return normalize_regions(LAYOUTS[variant](m, n), m * n)
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 
+from regions import variant_regions, normalize_regions, normalize_cages, normalize_pairs, \
+    normalize_sums
+from collections import OrderedDict
 import pulp
+import weakref
 
-# Returns a string in the format x_{i,j,k}.
+# Returns a string in the format x_{i,j,k} (the name of the variable in the
+# model, the variables themselves are kept by (i, j, k)).
 def var_name(i, j, k):
     return "x_{%d,%d,%d}" % (i, j, k)
 
@@ -10,18 +15,116 @@ def var_name(i, j, k):
 def crange(a, b):
     return range(a, b + 1)
 
+# Model templates, one for each (m, n, regions). Building the variables and
+# the constraints takes longer than solving for big puzzles, so it is done
+# once and the same model is reset and reused for every puzzle of that shape.
+# Only one puzzle uses a template at a time: a puzzle made while the one
+# holding the template is still alive builds a model of its own instead.
+# Every region layout is a key, so only the templates used last are kept.
+TEMPLATES_SIZE = 8
+templates = OrderedDict()
+
+class Template:
+    # A model and what the puzzle using it has added to it
+    def __init__(self, sudoku_model, x):
+        """
+        sudoku_model: The model with the constraints of the shape.
+        x: Its variables, by (i, j, k).
+        """
+
+        self.sudoku_model = sudoku_model
+        self.x = x
+        # the givens (fixed variables), the puzzle specific rows and the
+        # ruled out values (variables fixed at 0) of the puzzle using it
+        self.fixed = []
+        self.puzzle_rows = []
+        self.excluded = []
+        # weak reference to that puzzle, None while nobody has it
+        self.owner = None
+
+    # True if a puzzle that is still alive uses the template
+    def in_use(self):
+        return self.owner is not None and self.owner() is not None
+
+# Killer cage combinations, for each N: combination_tables[N][(size, total)]
+# is the list of the sets of size different values of 1..N that add up to
+# total. Filled in as the cages ask for them and kept for every puzzle.
+combination_tables = {}
+
+# Returns the digit sets a cage of the given size and sum can hold.
+def cage_combinations(N, size, total):
+    table = combination_tables.setdefault(N, {})
+    if (size, total) not in table:
+        found = []
+
+        # the values from smallest up, dropping the branches whose sum
+        # can't be reached anymore
+        def extend(digits, smallest, left):
+            if len(digits) == size:
+                if left == 0:
+                    found.append(frozenset(digits))
+                return
+            need = size - len(digits)
+            for k in crange(smallest, N - need + 1):
+                # the k and the smallest values after it are too much already
+                if k * need + need * (need - 1) // 2 > left:
+                    break
+                # the biggest values after k are still too little
+                if k + (need - 1) * (2 * N - need + 2) // 2 < left:
+                    continue
+                digits.append(k)
+                extend(digits, k + 1, left - k)
+                digits.pop()
+
+        extend([], 1, total)
+        table[(size, total)] = found
+    return table[(size, total)]
+
 class Sudoku:
+    # Variants with extra houses get the regions of their layout (regions.py)
+    variant = "normal"
+
+    # Solution cache (cache.SolutionCache) used by solve(), if one is set
+    cache = None
+
     # Initializes a solver for a Sudoku puzzle with block size m×n.
-    def __init__(self, m, n):
+    def __init__(self, m, n, regions=()):
         """
         m: The number of rows per puzzle block.
         n: The number of columns per puzzle block.
+        regions: More regions whose values must all be different, as lists
+                 of cells (i, j), besides those of the variant.
+
+        Raises ValueError if a region doesn't fit in the grid.
         """
         
         self.m = m
         self.n = n
+        self.N = m * n
+        self.regions = variant_regions(self.variant, m, n) + normalize_regions(regions, self.N)
+
+        key = (m, n, self.regions)
+        template = templates.get(key)
+        if template is not None:
+            templates.move_to_end(key)
+        if template is None or template.in_use():
+            self.build_model()
+            template = Template(self.sudoku_model, self.x)
+            if key not in templates:
+                templates[key] = template
+                if len(templates) > TEMPLATES_SIZE:
+                    templates.popitem(last=False)
+        template.owner = weakref.ref(self)
+        self.sudoku_model, self.x = template.sudoku_model, template.x
+        self.fixed, self.puzzle_rows, self.excluded = \
+            template.fixed, template.puzzle_rows, template.excluded
 
-        N = m * n
+        self.reset()
+
+    # Builds the model with the constraints every puzzle of this shape has.
+    def build_model(self):
+        N = self.m * self.n
+        m, n = self.m, self.n
 
         # Initialize the Sudoku model
         self.sudoku_model = pulp.LpProblem("Sudoku", pulp.LpMinimize)
@@ -32,17 +135,13 @@ class Sudoku:
         j: The column index of the cell.
         k: The value of the cell.
         """
-        x_names = [var_name(i, j, k)
-                   for i in crange(1, N)
-                   for j in crange(1, N)
-                   for k in crange(1, N)]
-
-        # Create a dictionary with all the needed variables x_{i,j,k}
-        self.x = pulp.LpVariable.dict("%s",
-                                      x_names,
-                                      lowBound=0,
-                                      upBound=1,
-                                      cat=pulp.LpInteger)
+        # Create a dictionary with all the needed variables x_{i,j,k}, by
+        # (i, j, k) so that looking one up doesn't format its name
+        self.x = {(i, j, k): pulp.LpVariable(var_name(i, j, k), lowBound=0, upBound=1,
+                                             cat=pulp.LpInteger)
+                  for i in crange(1, N)
+                  for j in crange(1, N)
+                  for k in crange(1, N)}
         
         # Define the objective function
         self.sudoku_model += 0
@@ -51,19 +150,19 @@ class Sudoku:
         # Add the constraints for the rows (each value k must appear exactly once)
         for i in crange(1, N):
             for k in crange(1, N):
-                self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
+                self.sudoku_model += (pulp.lpSum([self.x[i, j, k]
                                                   for j in crange(1, N)]) == 1)
                 
         # Add the constraints for the columns (each value k must appear exactly once)
         for j in crange(1, N):
             for k in crange(1, N):
-                self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
+                self.sudoku_model += (pulp.lpSum([self.x[i, j, k]
                                                   for i in crange(1, N)]) == 1)
                 
         # Add the constraints for the cells (each cell must contain exactly one value)
         for i in crange(1, N):
             for j in crange(1, N):
-                self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
+                self.sudoku_model += (pulp.lpSum([self.x[i, j, k]
                                                   for k in crange(1, N)]) == 1)
                 
         # Each value k appears exactly once in each block (I,J)
@@ -76,9 +175,47 @@ class Sudoku:
                 block_j_values = range(j_low, j_low + n)
 
                 for k in crange(1, N):
-                    self.sudoku_model += sum([self.x[var_name(i, j, k)]
+                    self.sudoku_model += sum([self.x[i, j, k]
                                               for i in block_i_values
                                               for j in block_j_values]) == 1
+
+        self.add_region_constraints()
+
+    # Each value k appears once in each region of N cells, and at most once
+    # in a smaller one. Added once to the model template of the regions.
+    def add_region_constraints(self):
+        for k in crange(1, self.N):
+            for region in self.regions:
+                in_region = pulp.lpSum([self.x[i, j, k] for i, j in region])
+                if len(region) == self.N:
+                    self.sudoku_model += in_region == 1
+                else:
+                    self.sudoku_model += in_region <= 1
+
+    # Adds a constraint that only belongs to this puzzle (removed by reset).
+    def add_puzzle_constraint(self, constraint):
+        name = "puzzle_%d" % len(self.puzzle_rows)
+        self.sudoku_model += constraint, name
+        self.puzzle_rows.append(name)
+
+    # Clears the givens, the puzzle constraints and the last solution, so
+    # that the model can be used for a new puzzle.
+    def reset(self):
+        for x in self.fixed:
+            x.lowBound = 0
+        for x in self.excluded:
+            x.upBound = 1
+        for name in self.puzzle_rows:
+            del self.sudoku_model.constraints[name]
+        del self.fixed[:]
+        del self.puzzle_rows[:]
+        del self.excluded[:]
+
+        for x in self.x.values():
+            x.varValue = None
+        self.sudoku_model.status = pulp.LpStatusNotSolved
+        self.model_sizes = None
+        self.givens = {}
         
     # Sets the value of cell (i,j) to k.
     def set_cell_value(self, i, j, k):
@@ -90,21 +227,251 @@ class Sudoku:
         if self.sudoku_model.status != pulp.LpStatusNotSolved:
             raise RuntimeError("Puzzle has already been solved.")
 
-        self.sudoku_model += self.x[var_name(i, j, k)] == 1
+        # Fix the variable instead of adding a row to the model
+        x = self.x[i, j, k]
+        x.lowBound = 1
+        self.fixed.append(x)
+        self.givens[(i, j)] = k
             
+    # Rules out the value k for cell (i,j).
+    def exclude_cell_value(self, i, j, k):
+        x = self.x[i, j, k]
+        if x.upBound != 0:
+            x.upBound = 0
+            self.excluded.append(x)
+
     # Returns the value of cell (i,j) or None if the puzzle has not yet been solved.    
     def get_cell_value(self, i, j):
         N = self.size()
         
         for k in crange(1, N):
-            if self.x[var_name(i, j, k)].value() == 1:
+            if self.x[i, j, k].value() == 1:
                 return k
         return None
     
+    # Presolve: works out what the givens already decide before CBC is called.
+    def presolve(self):
+        """
+        Every "exactly one of these is 1" row of the model (a cell, a value
+        in a row/column/block or in an extra house of a variant) is used
+        for simple elimination (a variable at 1 sets the others of its rows
+        to 0) and for singles (a row with one variable left that is not 0
+        sets it to 1).
+
+        Returns the model that is left for CBC: only the undecided variables
+        and the rows that still have one, or None if the givens contradict
+        each other. The decided variables get their values right away.
+        """
+
+        constraints = list(self.sudoku_model.constraints.values())
+
+        # rows where exactly one variable is 1, by variable name
+        rows_of = {}
+        for c in constraints:
+            if c.sense == pulp.LpConstraintEQ and c.constant == -1 \
+               and all(a == 1 for a in c.values()):
+                row = list(c.keys())
+                for x in row:
+                    rows_of.setdefault(x.name, []).append(row)
+
+        value = {}
+        ones = [x for x in self.fixed]
+        for x in ones:
+            value[x.name] = 1
+
+        # y is 0 now, so it was one of the options of its rows: a row with
+        # one option left queues it as a one. False if a row has none left
+        def zero(y):
+            value[y.name] = 0
+            for other in rows_of.get(y.name, []):
+                left = [z for z in other if value.get(z.name) != 0]
+                if len(left) == 0:
+                    return False
+                if len(left) == 1 and left[0].name not in value:
+                    value[left[0].name] = 1
+                    ones.append(left[0])
+            return True
+
+        for x in self.excluded:
+            if value.get(x.name) == 1 or not zero(x):
+                return None
+
+        # Propagate the ones until nothing changes
+        while ones:
+            x = ones.pop()
+            for row in rows_of.get(x.name, []):
+                for y in row:
+                    if y is x:
+                        continue
+                    if value.get(y.name) == 1:
+                        return None
+                    if y.name in value:
+                        continue
+                    if not zero(y):
+                        return None
+
+        for x in self.x.values():
+            if x.name in value:
+                x.varValue = value[x.name]
+
+        # Build the model with what is left
+        model = pulp.LpProblem("Sudoku", pulp.LpMinimize)
+        model += 0
+        free = set()
+        for c in constraints:
+            terms = [(x, a) for x, a in c.items() if x.name not in value]
+            known = c.constant + sum(a * value[x.name] for x, a in c.items()
+                                     if x.name in value)
+            if not terms:
+                # decided by the presolve, it only has to hold
+                if (c.sense == pulp.LpConstraintEQ and known != 0) \
+                   or (c.sense == pulp.LpConstraintLE and known > 0) \
+                   or (c.sense == pulp.LpConstraintGE and known < 0):
+                    return None
+                continue
+            model += pulp.LpConstraint(pulp.LpAffineExpression(terms),
+                                       c.sense, rhs=-known)
+            free.update(x.name for x, a in terms)
+
+        # Number of variables and constraints before and after the presolve
+        self.model_sizes = (len(self.x), len(free),
+                            len(constraints), model.numConstraints())
+        return model
+
     # Solves the puzzle and returns True if the puzzle is solvable, False otherwise.
-    def solve(self):
-        status = self.sudoku_model.solve()
-        return status == pulp.LpStatusOptimal
+    def solve(self, solver=None, backend="ilp"):
+        """
+        solver: The PuLP solver to use (e.g. pulp.PULP_CBC_CMD(msg=False)),
+                by default the one PuLP picks.
+        backend: "ilp" to presolve the model and hand it to the solver, or
+                 "dlx" to solve it in process as an exact cover (dlx.py).
+        """
+
+        # Only plain puzzles use the cache, the variants have other symmetries
+        use_cache = self.cache is not None and type(self) is Sudoku and not self.regions
+        if use_cache:
+            N = self.size()
+            board = [[self.givens.get((i, j), 0) for j in crange(1, N)]
+                     for i in crange(1, N)]
+            solution = self.cache.get(board, self.m, self.n)
+            if solution is not None:
+                for i in crange(1, N):
+                    for j in crange(1, N):
+                        for k in crange(1, N):
+                            self.x[i, j, k].varValue = int(solution[i - 1][j - 1] == k)
+                self.model_sizes = (len(self.x), 0, self.sudoku_model.numConstraints(), 0)
+                self.sudoku_model.status = pulp.LpStatusOptimal
+                return True
+
+        if backend == "dlx":
+            self.solve_exact_cover()
+        else:
+            self.solve_ilp(solver)
+
+        if use_cache and self.sudoku_model.status == pulp.LpStatusOptimal:
+            self.cache.put(board, self.m, self.n,
+                           [[self.get_cell_value(i, j) for j in crange(1, N)]
+                            for i in crange(1, N)])
+        return self.sudoku_model.status == pulp.LpStatusOptimal
+
+    # Presolves the model and solves what is left with the PuLP solver.
+    def solve_ilp(self, solver):
+        model = self.presolve()
+        if model is None:
+            self.sudoku_model.status = pulp.LpStatusInfeasible
+        elif self.model_sizes[3] == 0:
+            # the presolve found the whole solution
+            self.sudoku_model.status = pulp.LpStatusOptimal
+        else:
+            self.sudoku_model.status = model.solve(solver)
+
+    # The model as an exact cover problem (dlx.py).
+    def exact_cover(self):
+        # only loaded when this backend is used
+        from dlx import ExactCover
+        cells = {x.name: (i, j) for (i, j, k), x in self.x.items()}
+        return ExactCover(self.sudoku_model, cells)
+
+    # Solves the model as an exact cover, the givens are the options that
+    # are already picked.
+    def solve_exact_cover(self):
+        self.use_cover(self.exact_cover().solve([x.name for x in self.fixed],
+                                                [x.name for x in self.excluded]))
+
+    # Takes the options of a cover (None if there is none) as the solution.
+    def use_cover(self, found):
+        if found is None:
+            self.sudoku_model.status = pulp.LpStatusInfeasible
+            return
+        found = set(found)
+        for x in self.x.values():
+            x.varValue = int(x.name in found)
+        self.sudoku_model.status = pulp.LpStatusOptimal
+
+    # Returns the number of solutions of the puzzle, counting stops at limit.
+    def count_solutions(self, limit=2, solver=None, backend="ilp"):
+        """
+        limit: Where to stop counting; with the default 2 the answer tells
+               no solution (0), unique (1) and not unique (2) apart.
+        solver, backend: As for solve().
+
+        The puzzle is solved first if it isn't yet, and keeps that solution.
+        With the ILP backend every solution found is cut off with a no-good
+        row (its values can't all be taken again) and the same model is
+        solved again; the cuts are removed afterwards. The exact cover
+        backend counts the covers of one search, the first of them being
+        the solution if the puzzle wasn't solved yet.
+        """
+
+        if self.sudoku_model.status not in (pulp.LpStatusNotSolved, pulp.LpStatusOptimal):
+            return 0
+
+        if backend == "dlx":
+            unsolved = self.sudoku_model.status == pulp.LpStatusNotSolved
+            count = 0
+            for found in self.exact_cover().solutions([x.name for x in self.fixed],
+                                                      [x.name for x in self.excluded]):
+                if unsolved and count == 0:
+                    self.use_cover(found)
+                count += 1
+                if count >= limit:
+                    break
+            if unsolved and count == 0:
+                self.use_cover(None)
+            return count
+
+        if self.sudoku_model.status == pulp.LpStatusNotSolved:
+            self.solve(solver, backend)
+        if self.sudoku_model.status != pulp.LpStatusOptimal:
+            return 0
+
+        # the solution to give back when counting is done
+        solution = {key: x.varValue for key, x in self.x.items()}
+        model_sizes = self.model_sizes
+        given = set(x.name for x in self.fixed)
+        cuts = len(self.puzzle_rows)
+
+        count = 1
+        while count < limit:
+            ones = [x for x in self.x.values()
+                    if x.name not in given and round(x.value() or 0) == 1]
+            # every cell is given, there is nothing else to find
+            if not ones:
+                break
+            self.add_puzzle_constraint(pulp.lpSum(ones) <= len(ones) - 1)
+            self.solve_ilp(solver)
+            if self.sudoku_model.status != pulp.LpStatusOptimal:
+                break
+            count += 1
+
+        for name in self.puzzle_rows[cuts:]:
+            del self.sudoku_model.constraints[name]
+        del self.puzzle_rows[cuts:]
+        for key, x in self.x.items():
+            x.varValue = solution[key]
+        self.model_sizes = model_sizes
+        self.sudoku_model.status = pulp.LpStatusOptimal
+        return count
 
     # Returns the number of rows/columns in the puzzle.
     def size(self):
@@ -112,7 +479,16 @@ class Sudoku:
     
     
 class Killer_Sudoku(Sudoku):
+    # Initializes a solver for a Killer Sudoku puzzle with block size m×n.
     def __init__(self, m, n, cages):
+        """
+        cages: The cages of the puzzle, ([(i, j), ...], sum) each.
+
+        Raises ValueError if a cage doesn't fit in the grid or its sum can't
+        be made (regions.normalize_cages).
+        """
+
+        cages = normalize_cages(cages, m * n)
         super().__init__(m, n)  # Call the constructor of the base class
         self.cages = cages
         self.N = self.m * self.n  # Store N as an instance variable in Killer_Sudoku
@@ -123,210 +499,126 @@ class Killer_Sudoku(Sudoku):
             cage_cells = cage[0]
             cage_sum = cage[1]
 
-            if len(cage_cells) == 1:
-                i, j = cage_cells[0]
-                self.sudoku_model += (pulp.lpSum([k * self.x[var_name(i, j, k)]
-                                                 for k in crange(1, self.N)]) == cage_sum)
-                continue
+            self.add_puzzle_constraint(pulp.lpSum([k * self.x[i, j, k]
+                                                   for i, j in cage_cells
+                                                   for k in crange(1, self.N)]) == cage_sum)
 
-            self.sudoku_model += (pulp.lpSum([k * self.x[var_name(i, j, k)]
-                                             for i, j in cage_cells
-                                             for k in crange(1, self.N)]) == cage_sum)
+            # The values of a cage are different, so they are one of the
+            # digit sets of its size and sum: the values that are in none of
+            # them are ruled out before solving, and the ones that are in all
+            # of them appear exactly once in the cage (the others at most once)
+            combinations = cage_combinations(self.N, len(cage_cells), cage_sum)
+            possible = frozenset().union(*combinations)
+            for k in crange(1, self.N):
+                if k not in possible:
+                    for i, j in cage_cells:
+                        self.exclude_cell_value(i, j, k)
+                elif len(cage_cells) > 1:
+                    in_cage = pulp.lpSum([self.x[i, j, k] for i, j in cage_cells])
+                    if all(k in digits for digits in combinations):
+                        self.add_puzzle_constraint(in_cage == 1)
+                    else:
+                        self.add_puzzle_constraint(in_cage <= 1)
 
-            for i, j in cage_cells:
-                self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                                  for k in crange(1, self.N)]) == 1)   
-                
 
 class Greater_Than_Sudoku(Sudoku):
-    def __init__(self, m, n, cages):
+    # Initializes a solver for a Greater Than Sudoku puzzle with block size m×n.
+    def __init__(self, m, n, pairs):
+        """
+        pairs: The comparisons of the puzzle, ((i1, j1), (i2, j2)) for each
+               cell (i1,j1) that is greater than its neighbour (i2,j2).
+
+        Raises ValueError if a pair isn't two cells of the grid
+        (regions.normalize_pairs).
+        """
+
+        pairs = normalize_pairs(pairs, m * n)
         super().__init__(m, n)  # Call the constructor of the base class
         self.N = self.m * self.n  # Store N as an instance variable in Greater_Than_Sudoku
-        self.cages = cages
-        self.possible_values = {}  # Initialize possible values as a dictionary
+        self.pairs = pairs
+        self.add_greater_than_constraints()
+
+    def add_greater_than_constraints(self):
+        for (i1, j1), (i2, j2) in self.pairs:
+            # (i1,j1) <= k means (i2,j2) <= k-1, for every k. Unlike comparing
+            # the two values as sums, this keeps the LP relaxation as tight
+            # as the pair itself and CBC prunes with it
+            for k in crange(1, self.N):
+                self.add_puzzle_constraint(
+                    pulp.lpSum([self.x[i1, j1, l] for l in crange(1, k)])
+                    <= pulp.lpSum([self.x[i2, j2, l] for l in crange(1, k - 1)]))
+
+
+# The variants that only add regions are their layout in regions.py
 
-    def assign_possible_values(self):
-        """
-        Assign initial possible values for each cell in the Sudoku grid.
-        Each cell can initially hold any value from 1 to N.
-        """
-        for i in crange(1, self.N):
-            for j in crange(1, self.N):
-                self.possible_values[(i, j)] = set(crange(1, self.N))
-                
-    def erase_possible_values(self):
-        """
-        Adjust the possible values for each cell based on the greater-than constraints.
-        This function ensures that the values in the pairs of cells defined by the cages
-        satisfy the greater-than relationship.
-        """
-        for cage in self.cages:
-            i1, j1, i2, j2 = cage
-            i1, j1, i2, j2 = int(i1), int(j1), int(i2), int(j2)
-            
-            if self.get_cell_value(i1, j1) is not None:
-                # Erase the values of the second cell that are >= the value of the first cell
-                value_i1_j1 = self.get_cell_value(i1, j1)
-                self.possible_values[(i2, j2)] -= set(crange(value_i1_j1, self.N))
-                return True
-            
-            elif self.get_cell_value(i2, j2) is not None:
-                # Erase the values of the first cell that are <= the value of the second cell
-                value_i2_j2 = self.get_cell_value(i2, j2)
-                self.possible_values[(i1, j1)] -= set(crange(1, value_i2_j2))
-                return True
-            
-            elif self.get_cell_value(i1, j1) is not None and self.get_cell_value(i2, j2) is not None:
-                # Find the lowest value of the second cell
-                lowest_value_i2_j2 = min(self.possible_values[(i2, j2)])
-                
-                # Find the highest value of the first cell
-                highest_value_i1_j1 = max(self.possible_values[(i1, j1)])
-                
-                # Erase the values of the first cell that are <= the lowest value of the second cell
-                self.possible_values[(i1, j1)] -= set(crange(1, lowest_value_i2_j2))
-                
-                # Erase the values of the second cell that are >= the highest value of the first cell
-                self.possible_values[(i2, j2)] -= set(crange(highest_value_i1_j1, self.N))
-                return True
-            
-            else:    
-                return False
-                
-                    
-    def solve(self):
-        self.assign_possible_values()
-        self.erase_possible_values()
-        
-        # While there is a cell with 2 or more possible values then continue running the loop
-        while any(len(self.possible_values[(i, j)]) > 1 for i in crange(1, self.N) for j in crange(1, self.N)):
-            print(self.possible_values)
-            if not self.erase_possible_values():
-                exit(1)
-            
-        # If there is a cell with no possible values then the puzzle is not valid
-        if any(len(self.possible_values[(i, j)]) == 0 for i in crange(1, self.N) for j in crange(1, self.N)):
-            return False
-            
-        # Assign the values to the cells
-        for i in crange(1, self.N):
-            for j in crange(1, self.N):
-                if len(self.possible_values[(i, j)]) == 1:
-                    self.set_cell_value(i, j, list(self.possible_values[(i, j)])[0])
-            
-                
 class X_Sudoku(Sudoku):
-    def __init__(self, m, n):
-        super().__init__(m, n)  # Call the constructor of the base class
-        self.N = self.m * self.n  # Store N as an instance variable in X_Sudoku
-        self.add_x_sudoku_constraints()
-        
-    def add_x_sudoku_constraints(self):
-        # The values of each diagonal must be different (from 0 to 9)
-        for k in crange(1, self.N):
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, i, k)]
-                                              for i in crange(1, self.N)]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, self.N - i + 1, k)]
-                                              for i in crange(1, self.N)]) == 1)
-    
+    variant = "x"
+
+
 class Hyper_Sudoku(Sudoku):
-    def __init__(self, m, n):
-        super().__init__(m, n)  # Call the constructor of the base class
-        self.N = self.m * self.n  # Store N as an instance variable in Hyper_Sudoku
-        self.add_hyper_sudoku_constraints()
-        
-    def add_hyper_sudoku_constraints(self):
-        for k in crange(1, self.N):
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i in crange(2, 4)
-                                              for j in crange(2, 4)]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i in crange(2, 4)
-                                              for j in crange(6, 8)]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i in crange(6, 8)
-                                              for j in crange(2, 4)]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i in crange(6, 8)
-                                              for j in crange(6, 8)]) == 1)
-            
+    variant = "hyper"
+
 
 class Four_Pyramids_Sudoku(Sudoku):
-    def __init__(self, m, n):
-        super().__init__(m, n)  # Call the constructor of the base class
-        self.N = self.m * self.n  # Store N as an instance variable in Four_Pyramids_Sudoku
-        self.add_four_pyramids_sudoku_constraints()
-        
-    def add_four_pyramids_sudoku_constraints(self):
-        for k in crange(1, self.N):
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i, j in [(2,1), (3,1), (3,2), (4,1), (4,2), (4,3), (5,1), (5,2), (6,1)]]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i, j in [(1,4), (1,5), (2,5), (1,6), (2,6), (3,6), (1,7), (2,7), (1,8)]]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i, j in [(9,2), (9,3), (8,3), (9,4), (8,4), (7,4), (9,5), (8,5), (9,6)]]) == 1)
-            self.sudoku_model += (pulp.lpSum([self.x[var_name(i, j, k)]
-                                              for i, j in [(8,9), (7,9), (7,8), (6,9), (6,8), (6,7), (5,9), (5,8), (4,9)]]) == 1)
-            
+    variant = "four-pyramids"
+
 
 class Sandwich_Sudoku(Sudoku):
     """
-    The Sandwich_Sudoku class extends the standard Sudoku puzzle by adding constraints that ensure the sum of the numbers between the digits 1 and 9 in each row and column matches specified values. The class performs this by:
+    In a Sandwich Sudoku the numbers between the 1 and the N (9 for a 9x9) of
+    every row and column add up to the sum given for that row or column.
 
-    - Initializing the Sudoku grid. (Αρχικοποίηση)
-    - Retrieving and verifying the positions of 1 and 9. (Βρισκειί/Επιβεβαιώνει τις θέσεις του 1 και 9)
-    - Calculating the sum of digits between 1 and 9. (Βρίσκει τα αθροίσματα)
-    - Ensuring these sums match the provided constraints. (Ελέγχει τους αντίστοιχους περιορισμούς)
-
-    If any of these conditions are not met, the class raises an error, enforcing the sandwich constraints on the puzzle.
+    For every two cells a < b of a line there is a "the 1 and the N are in a
+    and b" indicator: x[a,1] + x[a,N] + x[b,1] + x[b,N] is 2 exactly then, and
+    at most 1 otherwise. The sum of the cells between a and b only has to
+    equal the line's sum when the indicator is 2 (big-M rows that are loose
+    otherwise), and pairs whose distance can't make the sum at all are ruled
+    out with a single row. So the whole puzzle is solved in one CBC call.
     """
     def __init__(self, m, n, constraints):
+        """
+        constraints: The sums of the rows and the sums of the columns, in
+                     the order of the rows/columns.
+
+        Raises ValueError unless there are N sums of each that the values
+        between the 1 and the N can make (regions.normalize_sums).
+        """
+
+        constraints = normalize_sums(constraints, m * n)
         super().__init__(m, n)  # Call the constructor of the base class
         self.N = self.m * self.n  # Store N as an instance variable in Sandwich_Sudoku
         self.constraints = constraints
         self.add_sandwich_sudoku_constraints()
-        
+
+    # Adds the sandwich rows of one line (cells is the list of its cells).
+    def add_sandwich_line(self, cells, total):
+        N = self.N
+        inside = list(crange(2, N - 1))
+        for a in range(N):
+            for b in range(a + 1, N):
+                ends = pulp.lpSum([self.x[i, j, k]
+                                   for i, j in (cells[a], cells[b]) for k in (1, N)])
+                d = b - a - 1
+                # the smallest and the biggest sums d cells between the 1 and
+                # the N can have
+                low, high = sum(inside[:d]), sum(inside[len(inside) - d:])
+                if not low <= total <= high:
+                    self.add_puzzle_constraint(ends <= 1)
+                    continue
+
+                between = pulp.lpSum([k * self.x[i, j, k]
+                                      for i, j in cells[a + 1:b] for k in crange(1, N)])
+                # with the indicator off the cells between can also hold the
+                # 1 or the N, so the bounds are those of any d values
+                most = sum(crange(N - d + 1, N))
+                self.add_puzzle_constraint(between <= total + (most - total) * (2 - ends))
+                self.add_puzzle_constraint(between >= total - total * (2 - ends))
+
     def add_sandwich_sudoku_constraints(self):
-        for i in range(self.N):
-            row_constraint = int(self.constraints[0][i])
-            col_constraint = int(self.constraints[1][i])
-            
-            # Find the positions of 1 and 9 in each row and column
-            row_1_pos = -1
-            row_9_pos = -1
-            col_1_pos = -1
-            col_9_pos = -1
-            
-            for j in range(self.N):
-                for k in range(1, self.N + 1):
-                    if self.x[var_name(i + 1, j + 1, k)].value() == 1:
-                        if k == 1:
-                            row_1_pos = j + 1
-                        elif k == 9:
-                            row_9_pos = j + 1
-
-                    if self.x[var_name(j + 1, i + 1, k)].value() == 1:
-                        if k == 1:
-                            col_1_pos = j + 1
-                        elif k == 9:
-                            col_9_pos = j + 1
-            
-            if row_1_pos == -1 or row_9_pos == -1:
-                raise ValueError(f"Row {i} does not contain exactly one 1 and one 9.")
-            if col_1_pos == -1 or col_9_pos == -1:
-                raise ValueError(f"Column {i} does not contain exactly one 1 and one 9.")
-            
-            if row_1_pos < row_9_pos:
-                row_sum = sum(int(self.x[var_name(i + 1, j, k)].value()) for j in range(row_1_pos + 1, row_9_pos) for k in range(2, 9))
-            else:
-                row_sum = sum(int(self.x[var_name(i + 1, j, k)].value()) for j in range(row_9_pos + 1, row_1_pos) for k in range(2, 9))
-            
-            if col_1_pos < col_9_pos:
-                col_sum = sum(int(self.x[var_name(j, i + 1, k)].value()) for j in range(col_1_pos + 1, col_9_pos) for k in range(2, 9))
-            else:
-                col_sum = sum(int(self.x[var_name(j, i + 1, k)].value()) for j in range(col_9_pos + 1, col_1_pos) for k in range(2, 9))
-            
-            if row_sum != row_constraint:
-                raise ValueError(f"Row {i} constraint violated: Sum between 1 and 9 is not equal to {row_constraint}")
-            if col_sum != col_constraint:
-                raise ValueError(f"Column {i} constraint violated: Sum between 1 and 9 is not equal to {col_constraint}")
\ No newline at end of file
+        N = self.N
+        for i in crange(1, N):
+            self.add_sandwich_line([(i, j) for j in crange(1, N)],
+                                   self.constraints[0][i - 1])
+        for j in crange(1, N):
+            self.add_sandwich_line([(i, j) for i in crange(1, N)],
+                                   self.constraints[1][j - 1])
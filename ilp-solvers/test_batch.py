@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Tests of the puzzle files and lines of batch.py:
+#
+#   python -m pytest ilp-solvers    or    cd ilp-solvers && python -m unittest
+
+from batch import read_puzzle_file, solve_file, solve_task, init_worker
+from regions import normalize_cages, normalize_pairs, normalize_sums
+import unittest
+
+# A 4x4 Killer Sudoku without givens, every row split in two cages
+KILLER = """2 2
+_ _ _ _
+_ _ _ _
+_ _ _ _
+_ _ _ _
+
+[(1,1),(1,2)],3
+[(1,3),(1,4)],7
+[(2,1),(2,2)],7
+[(2,3),(2,4)],3
+[(3,1),(3,2)],5
+[(3,3),(3,4)],5
+[(4,1),(4,2)],5
+[(4,3),(4,4)],5"""
+
+# An empty 4x4 grid and the clues of the other variants after it
+GRID = """2 2
+_ _ _ _
+_ _ _ _
+_ _ _ _
+_ _ _ _
+
+"""
+GREATER_THAN = "[(1,2),(1,1)],gt\n[(2,1),(2,2)],gt\n"
+SANDWICH = "rows: 5, 0, 0, 5\ncolumns: 5, 0, 0, 5"
+
+# The puzzle with its last cage replaced
+def with_last_cage(cage):
+    return KILLER.rsplit("\n", 1)[0] + "\n" + cage
+
+class CageTest(unittest.TestCase):
+
+    def test_good_cages(self):
+        m, n, board, cages = read_puzzle_file(KILLER, "killer")
+        self.assertEqual(len(cages), 8)
+        self.assertEqual(cages[0], (((1, 1), (1, 2)), 3))
+        # the puzzle has more than one solution, all of them keep the sums
+        solution = solve_file(KILLER, "dlx", variant="killer")
+        for cells, total in cages:
+            self.assertEqual(sum(int(solution[(i - 1) * 4 + j - 1]) for i, j in cells), total)
+
+    def test_bad_cages(self):
+        bad = {"outside the grid": "[(4,3),(5,5)],5",
+               "repeated cell": "[(4,3),(4,3)],5",
+               "cell of another cage": "[(4,3),(3,4)],5",
+               "too many cells": "[(4,3),(4,4),(3,3),(3,4),(2,4)],15",
+               "sum too small": "[(4,3),(4,4)],2",
+               "sum too big": "[(4,3),(4,4)],8"}
+        for name, cage in bad.items():
+            with self.subTest(name):
+                self.assertIsNone(read_puzzle_file(with_last_cage(cage), "killer"))
+                self.assertEqual(solve_file(with_last_cage(cage), "ilp", variant="killer"),
+                                 "Invalid puzzle")
+
+    def test_normalize_cages(self):
+        self.assertEqual(normalize_cages([([(1, 1)], 4)], 4), ((((1, 1),), 4),))
+        for cages in ([([], 1)], [([(0, 1)], 1)], [([(1, 1), (1, 2)], 8)]):
+            with self.subTest(cages):
+                with self.assertRaises(ValueError):
+                    normalize_cages(cages, 4)
+
+    # A bad cage is one result of a parallel run, not the end of it
+    def test_bad_cage_task(self):
+        init_worker("ilp", "killer", None, None, 1)
+        self.assertEqual(solve_task(("file", with_last_cage("[(10,10)],5"))), "Invalid puzzle")
+
+class ClueTest(unittest.TestCase):
+
+    def test_good_clues(self):
+        self.assertEqual(read_puzzle_file(GRID + GREATER_THAN, "greater-than")[3],
+                         (((1, 2), (1, 1)), ((2, 1), (2, 2))))
+        self.assertEqual(read_puzzle_file(GRID + SANDWICH, "sandwich")[3],
+                         ((5, 0, 0, 5), (5, 0, 0, 5)))
+        # not the only solution, but every line keeps its sum
+        solution = solve_file(GRID + SANDWICH, "dlx", variant="sandwich")
+        rows = [[int(k) for k in solution[i * 4:i * 4 + 4]] for i in range(4)]
+        for line, total in zip(rows + [list(c) for c in zip(*rows)], [5, 0, 0, 5] * 2):
+            a, b = sorted((line.index(1), line.index(4)))
+            self.assertEqual(sum(line[a + 1:b]), total)
+
+    def test_bad_pairs(self):
+        bad = {"outside the grid": "[(5,1),(4,1)],gt",
+               "one cell": "[(1,1),(1,1)],gt",
+               "one cell only": "[(1,1)],gt"}
+        for name, pair in bad.items():
+            with self.subTest(name):
+                text = GRID + GREATER_THAN + pair
+                self.assertIsNone(read_puzzle_file(text, "greater-than"))
+                self.assertEqual(solve_file(text, "ilp", variant="greater-than"),
+                                 "Invalid puzzle")
+
+    def test_bad_sums(self):
+        bad = {"no sums": "",
+               "no columns": "rows: 5, 0, 0, 5",
+               "too few": "rows: 5, 0, 0\ncolumns: 5, 0, 0, 5",
+               "too big": "rows: 5, 0, 0, 6\ncolumns: 5, 0, 0, 5",
+               "not a number": "rows: 5, 0, 0, x\ncolumns: 5, 0, 0, 5"}
+        for name, sums in bad.items():
+            with self.subTest(name):
+                self.assertIsNone(read_puzzle_file(GRID + sums, "sandwich"))
+                self.assertEqual(solve_file(GRID + sums, "ilp", variant="sandwich"),
+                                 "Invalid puzzle")
+
+    def test_normalize(self):
+        with self.assertRaises(ValueError):
+            normalize_pairs([((0, 1), (1, 1))], 4)
+        with self.assertRaises(ValueError):
+            normalize_sums([[0] * 4, [0] * 4, [0] * 4], 4)
+
+    # A bad file is one result of a parallel run, not the end of it
+    def test_bad_clue_tasks(self):
+        init_worker("ilp", "sandwich", None, None, 1)
+        self.assertEqual(solve_task(("file", GRID)), "Invalid puzzle")
+        init_worker("ilp", "greater-than", None, None, 1)
+        self.assertEqual(solve_task(("file", GRID + "[(10,1),(9,1)],gt")), "Invalid puzzle")
+
+if __name__ == "__main__":
+    unittest.main()
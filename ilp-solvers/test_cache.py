@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Tests of the solution cache (cache.py):
+#
+#   python -m pytest ilp-solvers    or    cd ilp-solvers && python -m unittest
+
+from batch import read_puzzle_file, solve_with_methods
+from cache import SolutionCache, canonical_form, from_canonical, to_canonical, transpose
+import os
+import random
+import tempfile
+import unittest
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+# The board of a 9x9 puzzle of tests/
+def board_of(name):
+    with open(os.path.join(TESTS, name + ".in")) as f:
+        return read_puzzle_file(f.read())[2]
+
+# The same puzzle with its values relabelled, the rows of every band and
+# the columns of every stack shuffled, and transposed
+def disguise(board, rng):
+    names = list(range(1, 10))
+    rng.shuffle(names)
+    rows = [3 * band + i for band in range(3) for i in rng.sample(range(3), 3)]
+    cols = [3 * stack + j for stack in range(3) for j in rng.sample(range(3), 3)]
+    moved = [[names[board[i][j] - 1] if board[i][j] else 0 for j in cols] for i in rows]
+    return transpose(moved)
+
+class CacheTest(unittest.TestCase):
+
+    # A solution of the board that keeps its givens
+    def assertSolves(self, solution, board):
+        lines = solution + transpose(solution)
+        lines += [[solution[3 * (b // 3) + i][3 * (b % 3) + j] for i in range(3) for j in range(3)]
+                  for b in range(9)]
+        for line in lines:
+            self.assertEqual(sorted(line), list(range(1, 10)))
+        for i in range(9):
+            for j in range(9):
+                if board[i][j]:
+                    self.assertEqual(solution[i][j], board[i][j])
+
+    def test_disguised_puzzle_hits(self):
+        board = board_of("easy_1")
+        cache = SolutionCache()
+        self.assertIsNone(cache.get(board, 3, 3))
+        cache.put(board, 3, 3, solve_with_methods(3, 3, board))
+
+        rng = random.Random(1)
+        for test in range(5):
+            other = disguise(board, rng)
+            with self.subTest(test):
+                solution = cache.get(other, 3, 3)
+                self.assertIsNotNone(solution)
+                self.assertSolves(solution, other)
+        self.assertEqual((cache.hits, cache.misses), (5, 1))
+
+    def test_canonical_round_trip(self):
+        board = board_of("hard")
+        solution = solve_with_methods(3, 3, board)
+        key, transform = canonical_form(board, 3, 3)
+        self.assertEqual(canonical_form(disguise(board, random.Random(2)), 3, 3)[0], key)
+        self.assertEqual(from_canonical(to_canonical(solution, transform), transform), solution)
+
+    def test_eviction(self):
+        boards = [board_of(name) for name in ("easy_1", "hard", "expert")]
+        solutions = [solve_with_methods(3, 3, board) for board in boards]
+        cache = SolutionCache(size=2)
+        cache.put(boards[0], 3, 3, solutions[0])
+        cache.put(boards[1], 3, 3, solutions[1])
+        # the first one was used last, so the second one goes
+        self.assertIsNotNone(cache.get(boards[0], 3, 3))
+        cache.put(boards[2], 3, 3, solutions[2])
+        self.assertEqual(len(cache.solutions), 2)
+        self.assertIsNone(cache.get(boards[1], 3, 3))
+        self.assertEqual(cache.get(boards[0], 3, 3), solutions[0])
+        self.assertEqual(cache.get(boards[2], 3, 3), solutions[2])
+
+    def test_save_and_load(self):
+        boards = [board_of(name) for name in ("easy_1", "hard")]
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.json")
+            cache = SolutionCache(path=path)
+            for board in boards:
+                cache.put(board, 3, 3, solve_with_methods(3, 3, board))
+            cache.save()
+
+            loaded = SolutionCache(path=path)
+            self.assertEqual(loaded.solutions, cache.solutions)
+            for board in boards:
+                self.assertSolves(loaded.get(board, 3, 3), board)
+            # a smaller cache keeps the last ones
+            self.assertEqual(list(SolutionCache(size=1, path=path).solutions),
+                             list(cache.solutions)[-1:])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# Tests of the logic solver (methods.py):
+#
+#   python -m pytest ilp-solvers    or    cd ilp-solvers && python -m unittest
+
+from methods import csp_list, DIGITS, geometry, geometries, GEOMETRIES_SIZE
+from batch import solve_line, read_puzzle_file
+import methods
+import os
+import itertools
+import random
+import unittest
+
+# Mask of the values given
+def mask(*values):
+    out = 0
+    for k in values:
+        out |= 1 << (k - 1)
+    return out
+
+# What the house filter found before the matching: every way to give the
+# cells different values, and the values each cell gets in one of them
+def permutation_csp(inp):
+    out = [0] * len(inp)
+    for values in itertools.product(*(DIGITS[m] for m in inp)):
+        if len(set(values)) == len(values):
+            for i, k in enumerate(values):
+                out[i] |= mask(k)
+    return out
+
+class CspTest(unittest.TestCase):
+
+    def check(self, house, expected):
+        self.assertEqual(csp_list(house), expected)
+        self.assertEqual(permutation_csp(house), expected)
+
+    # 1 and 2 only fit the first two cells, so the others lose them
+    def test_naked_pair(self):
+        house = [mask(1, 2), mask(1, 2), mask(1, 3, 4), mask(2, 3, 4)]
+        self.check(house, [mask(1, 2), mask(1, 2), mask(3, 4), mask(3, 4)])
+
+    # 1 and 2 are only in the first two cells, which lose the rest
+    def test_hidden_pair(self):
+        house = [mask(1, 2, 3, 4), mask(1, 2, 4, 5), mask(3, 4, 5), mask(3, 4, 5), mask(3, 4, 5)]
+        self.check(house, [mask(1, 2), mask(1, 2), mask(3, 4, 5), mask(3, 4, 5), mask(3, 4, 5)])
+
+    # three cells with two values between them can't all be filled
+    def test_no_matching(self):
+        house = [mask(1, 2), mask(1, 2), mask(1, 2), mask(3, 4), mask(3, 4)]
+        self.check(house, [0] * 5)
+
+    # a house with more values than cells keeps the spare ones
+    def test_free_values(self):
+        house = [mask(1), mask(1, 2, 3), mask(2, 3, 4)]
+        self.check(house, [mask(1), mask(2, 3), mask(2, 3, 4)])
+
+    def test_random_houses(self):
+        rng = random.Random(1)
+        for test in range(300):
+            size = rng.randint(1, 7)
+            house = [rng.randint(1, (1 << size) - 1) for i in range(size)]
+            with self.subTest(house=house):
+                self.assertEqual(csp_list(house), permutation_csp(house))
+
+class GeometryTest(unittest.TestCase):
+
+    # Region layouts of a client don't pile up tables
+    def test_geometries_bounded(self):
+        for j in range(GEOMETRIES_SIZE + 5):
+            geometry(3, 3, [[(1, 1), (9, j % 9 + 1), (j // 9 + 2, 5)]])
+        self.assertLessEqual(len(geometries), GEOMETRIES_SIZE)
+        self.assertIs(geometry(3, 3), geometry(3, 3))
+
+class RegionsTest(unittest.TestCase):
+
+    # The empty grids of the variants the logic solver is meant for: every
+    # 9x9 layout and the diagonals of the bigger grids (a regression in the
+    # search with regions shows here as a test that doesn't end)
+    def test_empty_grids(self):
+        for m, n, variant in [(3, 3, "x"), (3, 3, "hyper"), (3, 3, "four-pyramids"),
+                              (3, 4, "x"), (4, 4, "x")]:
+            with self.subTest(variant=variant, blocks=(m, n)):
+                N = m * n
+                line = " ".join(["0"] * (N * N)) if N > 9 else "0" * (N * N)
+                self.assertNotIn(solve_line(line, "methods", m, n, variant=variant),
+                                 ("No solution", "Invalid puzzle"))
+
+# Levels of the 9x9 puzzles of tests/ (test3x3_7 was "Very Hard" while the
+# fourth factor was the time the logic took)
+LEVELS = {"easy_1": "Easy", "easy_2": "Easy", "expert": "Medium", "extreme": "Very Hard",
+          "hard": "Easy", "master": "Very Hard", "medium_1": "Easy", "medium_2": "Easy",
+          "test3x3_1": "Hard", "test3x3_2": "Easy", "test3x3_3": "Easy", "test3x3_4": "Easy",
+          "test3x3_5": "Hard", "test3x3_6": "Very Hard", "test3x3_7": "Hard",
+          "test3x3_8": "Easy", "test3x3_9": "Hard", "test3x3_10": "Easy"}
+
+class RatingTest(unittest.TestCase):
+
+    def test_levels(self):
+        tests = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+        boards, removed, backtracking = [], [], []
+        for name, level in LEVELS.items():
+            with open(os.path.join(tests, name + ".in")) as f:
+                m, n, board, extra = read_puzzle_file(f.read())
+            stats = methods.solve(board, False, False, m, n).stats
+            with self.subTest(name):
+                self.assertEqual(methods.evaluate_puzzle(board, stats, m, n), level)
+            boards.append(board)
+            removed.append(stats.advanced_removed())
+            backtracking.append(stats.backtracking_iterations if stats.backtracking_used else 0)
+
+        # the array rating gives the same levels
+        try:
+            import numpy
+            import rating
+        except ImportError:
+            return
+        self.assertEqual(list(rating.rate_puzzles(numpy.array(boards), 3, 3, removed, backtracking)),
+                         list(LEVELS.values()))
+
+if __name__ == "__main__":
+    unittest.main()
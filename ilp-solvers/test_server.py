@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Tests of the workers of sudoku-server:
+#
+#   python -m pytest ilp-solvers    or    cd ilp-solvers && python -m unittest
+
+from batch import percentile
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# An empty 4x4 grid, the clues go after it
+GRID = "2 2\n_ _ _ _\n_ _ _ _\n_ _ _ _\n_ _ _ _\n\n"
+
+class WorkerTest(unittest.TestCase):
+
+    # A puzzle with bad clues gets a reply, and the worker takes the next one
+    def test_bad_puzzles(self):
+        jobs = [("greater-than", "[(10,1),(9,1)],gt", "Invalid puzzle"),
+                ("sandwich", "", "Invalid puzzle"),
+                ("killer", "[(10,10)],5", "Invalid puzzle"),
+                ("sandwich", "rows: 5, 0, 0, 5\ncolumns: 5, 0, 0, 5", "Not unique")]
+        worker = subprocess.Popen([sys.executable, os.path.join(HERE, "sudoku-server"),
+                                   "--worker", "-w", "methods"], cwd=HERE, text=True,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            self.assertEqual(worker.stdout.readline(), "ready\n")
+            for variant, clues, expected in jobs:
+                job = {"solver": "dlx", "variant": variant, "unique": True, "file": GRID + clues}
+                worker.stdin.write(json.dumps(job) + "\n")
+                worker.stdin.flush()
+                self.assertEqual(json.loads(worker.stdout.readline()), expected)
+        finally:
+            worker.stdin.close()
+            self.assertEqual(worker.wait(), 0)
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+
+if __name__ == "__main__":
+    unittest.main()
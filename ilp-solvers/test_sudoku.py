@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# Tests of the ILP models (sudoku.py):
+#
+#   python -m pytest ilp-solvers    or    cd ilp-solvers && python -m unittest
+
+from sudoku import Sudoku, Killer_Sudoku, Greater_Than_Sudoku, Sandwich_Sudoku, crange, \
+    templates, TEMPLATES_SIZE
+import pulp
+import unittest
+
+# CBC without its log
+SOLVER = pulp.PULP_CBC_CMD(msg=False)
+
+# A 4x4 killer: every row split in two cages of two cells
+CAGES = [([(1, 1), (1, 2)], 3), ([(1, 3), (1, 4)], 7),
+         ([(2, 1), (2, 2)], 7), ([(2, 3), (2, 4)], 3),
+         ([(3, 1), (3, 2)], 5), ([(3, 3), (3, 4)], 5),
+         ([(4, 1), (4, 2)], 5), ([(4, 3), (4, 4)], 5)]
+
+# 4x4 puzzles with one solution, with many and with none (the givens don't
+# see each other, but 3 has no place left in the first row)
+UNIQUE = [[0, 0, 3, 0], [0, 4, 0, 2], [2, 1, 0, 0], [0, 0, 0, 0]]
+MANY = [[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+NONE = [[1, 2, 0, 0], [0, 0, 3, 0], [0, 0, 0, 3], [0, 0, 0, 0]]
+
+# A 4x4 model with the givens of a board set
+def puzzle_of(board):
+    puzzle = Sudoku(2, 2)
+    for i in crange(1, 4):
+        for j in crange(1, 4):
+            if board[i - 1][j - 1]:
+                puzzle.set_cell_value(i, j, board[i - 1][j - 1])
+    return puzzle
+
+# The solution of a puzzle as rows of values
+def rows(puzzle):
+    N = puzzle.size()
+    return [[puzzle.get_cell_value(i, j) for j in crange(1, N)] for i in crange(1, N)]
+
+class TemplateTest(unittest.TestCase):
+
+    # A second puzzle of the same shape must not clear the rows of the first
+    def test_interleaved_instances(self):
+        killer = Killer_Sudoku(2, 2, CAGES)
+        rows_before = len(killer.puzzle_rows)
+        self.assertGreater(rows_before, 0)
+
+        plain = Sudoku(2, 2)
+        plain.set_cell_value(1, 1, 4)
+        self.assertEqual(len(killer.puzzle_rows), rows_before)
+        self.assertIsNot(plain.sudoku_model, killer.sudoku_model)
+
+        self.assertTrue(killer.solve(SOLVER))
+        self.assertTrue(plain.solve(SOLVER))
+        solution = rows(killer)
+        for cells, total in CAGES:
+            self.assertEqual(sum(solution[i - 1][j - 1] for i, j in cells), total)
+        self.assertEqual(rows(plain)[0][0], 4)
+
+        # the first one still has its own givens and rows
+        self.assertEqual(len(killer.puzzle_rows), rows_before)
+        self.assertEqual(rows(killer), solution)
+
+    # Once the puzzle holding a template is gone the next one reuses it
+    def test_template_reused(self):
+        first = Sudoku(2, 2)
+        model = first.sudoku_model
+        first.set_cell_value(1, 1, 1)
+        del first
+
+        second = Sudoku(2, 2)
+        self.assertIs(second.sudoku_model, model)
+        self.assertEqual(second.fixed, [])
+        self.assertTrue(second.solve(SOLVER))
+
+    # Region layouts of a client don't pile up templates
+    def test_templates_bounded(self):
+        # 12 different layouts of one small region
+        for i in crange(2, 4):
+            for j in crange(1, 4):
+                Sudoku(2, 2, [[(1, 1), (i, j)]])
+        self.assertLessEqual(len(templates), TEMPLATES_SIZE)
+
+class CountTest(unittest.TestCase):
+
+    def test_counts(self):
+        for backend in ("ilp", "dlx"):
+            for board, expected in ((UNIQUE, 1), (MANY, 2), (NONE, 0)):
+                with self.subTest(backend=backend, expected=expected):
+                    puzzle = puzzle_of(board)
+                    self.assertEqual(puzzle.count_solutions(2, SOLVER, backend), expected)
+                    # the puzzle keeps a solution that has its givens
+                    if expected:
+                        solution = rows(puzzle)
+                        self.assertTrue(all(solution[i][j] == board[i][j]
+                                            for i in range(4) for j in range(4) if board[i][j]))
+                    del puzzle
+
+    def test_limit(self):
+        for backend in ("ilp", "dlx"):
+            with self.subTest(backend=backend):
+                puzzle = puzzle_of(MANY)
+                self.assertEqual(puzzle.count_solutions(5, SOLVER, backend), 5)
+                del puzzle
+
+    # Counting a solved puzzle keeps its solution
+    def test_count_after_solve(self):
+        for backend in ("ilp", "dlx"):
+            with self.subTest(backend=backend):
+                puzzle = puzzle_of(UNIQUE)
+                self.assertTrue(puzzle.solve(SOLVER, backend))
+                solution = rows(puzzle)
+                self.assertEqual(puzzle.count_solutions(2, SOLVER, backend), 1)
+                self.assertEqual(rows(puzzle), solution)
+                del puzzle
+
+class PresolveTest(unittest.TestCase):
+
+    # Singles are enough for this one, nothing is left for CBC
+    def test_solved_by_presolve(self):
+        board = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 0, 0]]
+        puzzle = puzzle_of(board)
+        model = puzzle.presolve()
+        self.assertIsNotNone(model)
+        self.assertEqual(puzzle.model_sizes[1], 0)
+        self.assertEqual(model.numConstraints(), 0)
+        self.assertEqual(puzzle.get_cell_value(4, 3), 2)
+        self.assertEqual(puzzle.get_cell_value(4, 4), 1)
+
+    # Two givens of the same value in a row are found before CBC
+    def test_contradiction(self):
+        puzzle = puzzle_of(MANY)
+        puzzle.set_cell_value(1, 2, 1)
+        self.assertIsNone(puzzle.presolve())
+        self.assertFalse(puzzle.solve(SOLVER))
+
+    def test_partly_decided(self):
+        puzzle = puzzle_of(UNIQUE)
+        model = puzzle.presolve()
+        variables, free, rows_before, rows_after = puzzle.model_sizes
+        self.assertEqual(variables, 64)
+        self.assertLess(free, variables)
+        self.assertLessEqual(rows_after, rows_before)
+        self.assertEqual(model.numConstraints(), rows_after)
+
+class KillerTest(unittest.TestCase):
+
+    # Cages that don't fit are turned down before they reach the model
+    def test_bad_cage(self):
+        for cage in (([(10, 10)], 5), ([(1, 1), (1, 1)], 3), ([(1, 1), (1, 2)], 9)):
+            with self.subTest(cage):
+                with self.assertRaises(ValueError):
+                    Killer_Sudoku(2, 2, CAGES[:-1] + [cage])
+
+class ClueTest(unittest.TestCase):
+
+    # Pairs that aren't two cells of the grid are turned down
+    def test_bad_pairs(self):
+        for pair in (((10, 1), (9, 1)), ((1, 0), (1, 1)), ((2, 2), (2, 2)), ((1, 1),)):
+            with self.subTest(pair):
+                with self.assertRaises(ValueError):
+                    Greater_Than_Sudoku(2, 2, [((1, 2), (1, 1)), pair])
+
+    # So are sums that are missing, too many or too big
+    def test_bad_sums(self):
+        for sums in ([], [[5, 0, 0, 5]], [[5, 0, 0], [5, 0, 0, 5]],
+                     [[5, 0, 0, 5, 0], [5, 0, 0, 5]], [[5, 0, 0, 6], [5, 0, 0, 5]]):
+            with self.subTest(sums):
+                with self.assertRaises(ValueError):
+                    Sandwich_Sudoku(2, 2, sums)
+
+    def test_good_clues(self):
+        self.assertTrue(Greater_Than_Sudoku(2, 2, [((1, 2), (1, 1))]).solve(SOLVER))
+        self.assertTrue(Sandwich_Sudoku(2, 2, [["5", "0", "0", "5"], [5, 0, 0, 5]]).solve(SOLVER))
+
+if __name__ == "__main__":
+    unittest.main()